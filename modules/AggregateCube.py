@@ -0,0 +1,230 @@
+import copy
+import numpy as np
+import pandas as pd
+
+from modules.TagMatrix import TagMatrix
+
+class AggregateCube:
+    """
+    Sums of per game measures by release year, tag and review summary, computed once so that
+    the charts aggregate a few thousand cells instead of the whole dataframe.
+
+    Games without a release year or review summary are kept in an extra last slot of that
+    dimension, so that totals over all slots cover every game. Sums skip NaN like a groupby sum.
+
+    The games are first summed into strata, the games sharing a release year, review summary
+    and tag combination, and the cube is summed from the strata. A filter on release years and
+    tags keeps or drops whole strata, so the cube of the filtered games is summed from the kept
+    strata without going back to the games (see filtered).
+
+    Attributes:
+        years: The release years, in ascending order.
+        summaries: The review summaries, in order of first appearance.
+        vocabulary: The tags of the tag matrix the cube was built from.
+        shape: Number of year and of summary slots.
+        stratum_rows: Position of the first game of every stratum.
+        stratum_cells: The (year, summary) cell of every stratum, numbered year major.
+        stratum_values: Array of shape (strata, measures) of the sums over the games of every stratum.
+        stratum_tags: TagMatrix of the tag combination of every stratum.
+        tag_cube: Array of shape (years + 1, summaries + 1, tags, measures) of the sums over the
+            games of every tag, counting a game once per occurrence of the tag.
+        totals: Array of shape (years + 1, summaries + 1, measures) of the sums over the games.
+    """
+    # games: number of games, weighted_score: review_score x Reviews Total
+    MEASURES = ['games', 'revenue', 'reviews', 'weighted_score']
+
+    def __init__(self, df, tag_matrix):
+        """
+        Builds the cube from the cleaned dataframe.
+
+        Args:
+            df: The cleaned dataframe.
+            tag_matrix: A TagMatrix aligned with the dataframe.
+        """
+        year_codes, years = pd.factorize(df['Release Date'].dt.year, sort=True)
+        summary_codes, summaries = pd.factorize(np.asarray(df['review_summary'], dtype=object))
+        self.years = pd.Index(years)
+        self.summaries = pd.Index(summaries)
+        self.vocabulary = tag_matrix.vocabulary
+
+        # missing years and summaries (code -1) go to the last slot
+        year_codes = np.where(year_codes < 0, len(years), year_codes)
+        summary_codes = np.where(summary_codes < 0, len(summaries), summary_codes)
+        self.shape = (len(years) + 1, len(summaries) + 1)
+        n_cells = self.shape[0] * self.shape[1]
+        cells = year_codes * self.shape[1] + summary_codes
+
+        # a stratum is a (tag combination, cell) pair which has games
+        combinations, first_rows = tag_matrix.distinct_rows()
+        strata, keys = pd.factorize(combinations * n_cells + cells)
+        self.stratum_rows = np.unique(strata, return_index=True)[1]
+        self.stratum_cells = keys % n_cells
+        self.stratum_tags = TagMatrix(
+            tag_matrix.matrix[first_rows][keys // n_cells], self.vocabulary, pd.RangeIndex(len(keys))
+        )
+
+        values = {
+            'games': np.ones(len(df)),
+            'revenue': df['Revenue Estimated'].to_numpy(dtype=float),
+            'reviews': df['Reviews Total'].to_numpy(dtype=float),
+            'weighted_score': (df['review_score'] * df['Reviews Total']).to_numpy(dtype=float),
+        }
+        self.stratum_values = np.column_stack([
+            np.bincount(strata, weights=np.nan_to_num(values[measure]), minlength=len(keys))
+            for measure in self.MEASURES
+        ])
+        self.tag_cube, self.totals = self.aggregate(np.ones(len(keys), dtype=bool))
+
+        # the cube is only read once built, which makes its queries safe to run from several threads
+        for array in (self.stratum_rows, self.stratum_cells, self.stratum_values, self.tag_cube, self.totals):
+            array.flags.writeable = False
+
+    def aggregate(self, selected):
+        """
+        Sums the measures of the selected strata over their cells, for every tag and in total.
+
+        Args:
+            selected: Boolean mask over the strata.
+
+        Returns:
+            The tag cube and the totals arrays.
+        """
+        n_cells = self.shape[0] * self.shape[1]
+        cells = np.where(selected, self.stratum_cells, -1)
+        tag_cube = self.stratum_tags.grouped_tag_sums(self.stratum_values, cells, n_cells)
+        tag_cube = tag_cube.reshape(self.shape + tag_cube.shape[1:])
+        totals = np.stack([
+            np.bincount(cells[selected], weights=self.stratum_values[selected, i], minlength=n_cells).reshape(self.shape)
+            for i in range(len(self.MEASURES))
+        ], axis=-1)
+        return tag_cube, totals
+
+    def filtered(self, start=None, end=None, rows=None):
+        """
+        Restricts the cube to the games released in an inclusive year range and, when given, to
+        the games of a row mask, by summing the kept strata again.
+
+        Args:
+            start: First year, None for no lower bound.
+            end: Last year, None for no upper bound.
+            rows: Optional boolean mask of the games to include. It must keep or drop whole
+                strata, as filters on release years and tags do (see FilterIndex).
+
+        Returns:
+            A new AggregateCube over the same years, summaries and tags.
+        """
+        selected = self.year_slots(start, end)[self.stratum_cells // self.shape[1]]
+        if rows is not None:
+            selected &= rows[self.stratum_rows]
+        cube = copy.copy(self)
+        cube.tag_cube, cube.totals = self.aggregate(selected)
+        cube.tag_cube.flags.writeable = False
+        cube.totals.flags.writeable = False
+        return cube
+
+    def year_slots(self, start=None, end=None):
+        """
+        Selects the year slots of an inclusive year range.
+
+        Args:
+            start: First year, None for no lower bound.
+            end: Last year, None for no upper bound.
+
+        Returns:
+            A boolean mask over the year slots. Games without a release year are only
+            included when neither bound is given.
+        """
+        if start is None and end is None:
+            return np.ones(len(self.years) + 1, dtype=bool)
+        years = self.years.to_numpy()
+        in_range = np.ones(len(years), dtype=bool)
+        if start is not None:
+            in_range &= years >= start
+        if end is not None:
+            in_range &= years <= end
+        return np.append(in_range, False)
+
+    def tag_sums(self, measure, start=None, end=None):
+        """
+        Sums a measure over the games of every tag released in an inclusive year range.
+
+        Returns:
+            A Series of sums indexed by tag.
+        """
+        cube = self.tag_cube[self.year_slots(start, end), :, :, self.MEASURES.index(measure)]
+        return pd.Series(cube.sum(axis=(0, 1)), index=self.vocabulary)
+
+    def year_totals(self, measure, start=None, end=None):
+        """
+        Sums a measure over the games of every release year in an inclusive year range.
+
+        Returns:
+            A Series of sums indexed by the years which have games.
+        """
+        games = self.totals[:-1, :, self.MEASURES.index('games')].sum(axis=1)
+        # a filtered cube keeps the years of the full one, some without games
+        slots = self.year_slots(start, end)[:-1] & (games > 0)
+        totals = self.totals[:-1, :, self.MEASURES.index(measure)].sum(axis=1)
+        return pd.Series(totals[slots], index=self.years[slots])
+
+    def summary_totals(self, measure):
+        """
+        Sums a measure over the games of every review summary.
+
+        Returns:
+            A Series of sums indexed by the review summaries which have games.
+        """
+        games = self.totals[:, :-1, self.MEASURES.index('games')].sum(axis=0) > 0
+        totals = self.totals[:, :-1, self.MEASURES.index(measure)].sum(axis=0)
+        return pd.Series(totals[games], index=self.summaries[games])
+
+    def period_cube(self, bins):
+        """
+        Sums every measure over the games of every tag for every period [bins[i], bins[i + 1])
+        of release years, cutting the years into periods once and reducing them in one product.
+
+        Args:
+            bins: Ascending period edges in years.
+
+        Returns:
+            An array of shape (periods + 1, tags, measures), whose last period holds the games
+            released outside every period or without a release year.
+        """
+        n_periods = len(bins) - 1
+        periods = pd.cut(self.years, bins=bins, right=False).codes
+        periods = np.append(periods, -1)
+        periods[periods < 0] = n_periods
+        membership = (periods == np.arange(n_periods + 1)[:, None]).astype(float)
+        return np.tensordot(membership, self.tag_cube.sum(axis=1), axes=1)
+
+    def tag_trends(self, tags, bins, labels=None):
+        """
+        Computes the review score of tags per period of release years, weighted by the number
+        of reviews of the games: the sum of review_score x Reviews Total over the sum of
+        Reviews Total. The cube is not modified.
+
+        Args:
+            tags: The tags to include; the ones which never occur are skipped.
+            bins: Ascending period edges in years, periods include their start and exclude their end.
+            labels: Period labels, 'start-last year' when not given.
+
+        Returns:
+            A dataframe of weighted average review scores indexed by period with one column
+            per tag, in alphabetical order.
+        """
+        if labels is None:
+            labels = [f'{start}-{end - 1}' for start, end in zip(bins, bins[1:])]
+
+        counts = self.tag_sums('games')
+        tags = sorted(tag for tag in set(tags) if counts.get(tag, 0) > 0)
+        positions = self.vocabulary.get_indexer(tags)
+
+        sums = self.period_cube(bins)[:-1, positions]
+        weighted_sums = sums[:, :, self.MEASURES.index('weighted_score')]
+        review_sums = sums[:, :, self.MEASURES.index('reviews')]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return pd.DataFrame(
+                weighted_sums / review_sums,
+                index=pd.Index(labels, name='Time Period'),
+                columns=pd.Index(tags)
+            )
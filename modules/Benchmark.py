@@ -0,0 +1,459 @@
+from modules.DataCleaner import DataCleaner
+from modules.Imputer import Imputer
+
+import multiprocessing
+import re
+import resource
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+# Row by row implementations which the vectorized DataCleaner stages replaced, kept as the reference
+
+def legacy_convert_reviews_to_float(df):
+    def parse_reviews(review_score):
+        try:
+            return float(review_score.replace('%', '').replace(',', '.'))
+        except AttributeError:
+            return np.nan
+
+    df['review_score'] = df['Reviews Score Fancy'].apply(parse_reviews)
+    return df.drop('Reviews Score Fancy', axis=1)
+
+
+def legacy_convert_revenue_to_float(df):
+    def parse_revenue(rev_str):
+        if isinstance(rev_str, str):
+            rev_str = re.sub(r'[^\d,]', '', rev_str).replace(',', '.')
+            return float(rev_str)
+        else:
+            return np.nan
+
+    df['Revenue Estimated'] = df['Revenue Estimated'].apply(parse_revenue)
+    return df
+
+
+def legacy_fill_null_of_all_reviews(df):
+    def extract_data(row):
+        count_match = re.search(r"\(([\d,]+)\)", row)
+        score_match = re.search(r"(\d+)%", row)
+
+        count = int(count_match.group(1).replace(",", "")) if count_match else np.nan
+        score = int(score_match.group(1)) if score_match else np.nan
+
+        return count, score
+
+    for index, row in df.iterrows():
+        if pd.isna(df.at[index, "Reviews Total"]) or pd.isna(df.at[index, "review_score"]):
+            count, score = extract_data(row["all_reviews"])
+            if pd.isna(df.at[index, "Reviews Total"]):
+                df.at[index, "Reviews Total"] = count
+            if pd.isna(df.at[index, "review_score"]):
+                df.at[index, "review_score"] = score
+
+    return df.drop('all_reviews', axis=1)
+
+
+class CleanerBenchmark:
+    """
+    A class to check the vectorized parsing stages of DataCleaner against their row by row
+    versions and to time both.
+
+    Attributes:
+        df1: The first raw dataframe.
+        df2: The second raw dataframe.
+        repeat: Number of runs per stage, the fastest one is reported.
+    """
+    # Stages compared, with the columns they write
+    STAGES = {
+        'convert_reviews_to_float': (legacy_convert_reviews_to_float, ['review_score']),
+        'convert_revenue_to_float': (legacy_convert_revenue_to_float, ['Revenue Estimated']),
+        'fill_null_of_all_reviews': (legacy_fill_null_of_all_reviews, ['Reviews Total', 'review_score']),
+    }
+
+    def __init__(self, df1, df2, repeat=3):
+        """
+        Initializes the CleanerBenchmark instance with the raw dataframes.
+
+        Args:
+            df1: The first raw dataframe.
+            df2: The second raw dataframe.
+            repeat: Number of runs per stage.
+        """
+        self.df1 = df1
+        self.df2 = df2
+        self.repeat = repeat
+
+    @classmethod
+    def fixture(cls):
+        """
+        Builds a few raw rows of both csv files covering the edge cases of the compared stages:
+        missing and non-numeric ('Free') prices, missing review scores, totals and review
+        summaries, review texts without counts, malformed dates and rows matched on one side only.
+
+        Returns:
+            A tuple of the first and the second raw dataframe.
+        """
+        df1 = pd.DataFrame({
+            'url': [f'https://store.steampowered.com/app/{app_id}/Game_{app_id}/' for app_id in (10, 11, 12, 13)],
+            'name': ['Game 10', None, 'Game 12', 'Game 13'],
+            'all_reviews': [
+                'Very Positive,(1,234),- 92% of the 1,234 user reviews for this game are positive.',
+                np.nan,
+                'Mixed,(56),- 61% of the 56 user reviews for this game are positive.',
+                'Positive',
+            ],
+            'release_date': ['Jul 18, 2007', 'not a date', 'Mar 2019', np.nan],
+            'popular_tags': ['Action,Indie', np.nan, 'Casual', 'RPG,Co-op'],
+            'original_price': ['$19.99', 'Free', np.nan, 'Free to Play'],
+        })
+        df2 = pd.DataFrame({
+            'Unnamed: 0': [0, 1, 2, 3],
+            'App ID': [10, 11, 13, 14],
+            'Title': ['Game 10', 'Game 11', 'Game 13', 'Game 14'],
+            'Reviews Total': [np.nan, 500.0, np.nan, 10.0],
+            'Reviews Score Fancy': ['85%', np.nan, '70,5%', '50%'],
+            'Release Date': ['2007-07-18', '2010-01-05', np.nan, '2015-03-01'],
+            'Launch Price': [np.nan, 'Free', '$4,99', '$9,99'],
+            'Tags': ['Action,Indie', np.nan, 'RPG', 'Casual'],
+            'Revenue Estimated': ['$1234567,89', np.nan, '$0,00', '$100,00'],
+        })
+        # the columns which the cleaner drops are left out, as DataLoader skips them while reading
+        return df1, df2
+
+    @classmethod
+    def check_fixture(cls):
+        """
+        Checks the vectorized stages against the row by row versions on the fixture, which needs
+        none of the data files.
+
+        Returns:
+            The result of run on the fixture.
+
+        Raises:
+            AssertionError: If a stage's output differs from its row by row version.
+        """
+        results = cls(*cls.fixture(), repeat=1).run()
+        unequal = list(results.index[~results['equal']])
+        if unequal:
+            raise AssertionError(f'vectorized stages differ from their row by row versions: {unequal}')
+        return results
+
+    def stage_input(self):
+        """
+        Runs the cleaning actions which come before the compared stages.
+
+        Returns:
+            The dataframe as the first compared stage receives it.
+        """
+        cleaner = DataCleaner(self.df1.copy(), self.df2.copy())
+        actions = cleaner.row_wise_actions()
+        names = [name for name, _ in actions]
+        # everything up to and including convert_price_to_float
+        return cleaner.run_actions(actions[:names.index('convert_price_to_float') + 1])
+
+    def best_time(self, func, df):
+        """
+        Times a stage on fresh copies of its input.
+
+        Returns:
+            A tuple of the fastest run in seconds and the output of the last run.
+        """
+        timings = []
+        for _ in range(self.repeat):
+            data = df.copy()
+            start = time.perf_counter()
+            output = func(data)
+            timings.append(time.perf_counter() - start)
+        return min(timings), output
+
+    def run(self):
+        """
+        Checks every stage for equal output and times the legacy and vectorized versions.
+
+        Returns:
+            A dataframe with one row per stage: timings, speedup and whether the outputs are equal.
+        """
+        df = self.stage_input()
+        # fill_null_of_all_reviews reads the review_score which convert_reviews_to_float produces
+        df['review_score'] = DataCleaner.from_merged(df).strings_to_float(df['Reviews Score Fancy'], r'%')
+
+        results = []
+        for stage, (legacy, columns) in self.STAGES.items():
+            legacy_time, expected = self.best_time(legacy, df)
+            vectorized_time, actual = self.best_time(
+                lambda data: getattr(DataCleaner.from_merged(data), stage)(), df
+            )
+            equal = all(expected[col].astype(float).equals(actual[col].astype(float)) for col in columns)
+            results.append({
+                'stage': stage,
+                'legacy_s': legacy_time,
+                'vectorized_s': vectorized_time,
+                'speedup': legacy_time / vectorized_time,
+                'equal': equal,
+            })
+        return pd.DataFrame(results).set_index('stage')
+
+
+class PipelineBenchmark:
+    """
+    A class to compare the wall time and peak memory of DataCleaner.clean_data with the
+    pipeline mode (DataCleaner.pipeline), which prunes columns early and drops in place.
+
+    Attributes:
+        df1: The first raw dataframe.
+        df2: The second raw dataframe.
+        repeat: Number of timed runs per mode, the fastest one is reported.
+    """
+
+    def __init__(self, df1, df2, repeat=3):
+        """
+        Initializes the PipelineBenchmark instance with the raw dataframes.
+
+        Args:
+            df1: The first raw dataframe.
+            df2: The second raw dataframe.
+            repeat: Number of timed runs per mode.
+        """
+        self.df1 = df1
+        self.df2 = df2
+        self.repeat = repeat
+
+    def modes(self):
+        """
+        Returns the compared modes as callables cleaning fresh copies of the raw dataframes.
+        """
+        return {
+            'clean_data': lambda df1, df2: DataCleaner(df1, df2).clean_data(),
+            'pipeline': lambda df1, df2: DataCleaner.pipeline(df1, df2),
+        }
+
+    def run(self):
+        """
+        Times every mode and measures its peak traced memory in a separate run, as tracing
+        slows the run down.
+
+        Returns:
+            A dataframe with one row per mode: wall time, peak memory and cleaned rows.
+        """
+        results = []
+        for mode, clean in self.modes().items():
+            timings = []
+            for _ in range(self.repeat):
+                df1, df2 = self.df1.copy(), self.df2.copy()
+                start = time.perf_counter()
+                df = clean(df1, df2)
+                timings.append(time.perf_counter() - start)
+
+            df1, df2 = self.df1.copy(), self.df2.copy()
+            tracemalloc.start()
+            baseline = tracemalloc.get_traced_memory()[0]
+            clean(df1, df2)
+            peak = tracemalloc.get_traced_memory()[1] - baseline
+            tracemalloc.stop()
+
+            results.append({
+                'mode': mode,
+                'wall_time_s': min(timings),
+                'peak_memory_mb': peak / 2 ** 20,
+                'rows': len(df),
+            })
+        return pd.DataFrame(results).set_index('mode')
+
+
+class ImputationBenchmark:
+    """
+    A class to compare the accuracy and cost of review_summary imputation strategies as the
+    data grows.
+
+    A fixed share of the known labels is masked and imputed again by every strategy: the fixed
+    parameter model with the hist and the approx tree method, an Optuna tuned model and a
+    majority label baseline. Besides the real data, synthetic frames resampled to a multiple of
+    its size are used. Every run happens in a fresh process so that its peak RSS, which includes
+    XGBoost's native memory, belongs to that run alone.
+
+    Attributes:
+        df: The cleaned dataframe.
+        mask_fraction: Share of the known labels masked.
+        scales: Sizes of the benchmarked frames as multiples of df, 1 being the real data.
+        strategies: Names of the benchmarked strategies.
+        n_trials: Number of Optuna trials of the tuned strategy.
+    """
+    STRATEGIES = ['majority', 'fixed_hist', 'fixed_approx', 'tuned_hist']
+
+    def __init__(self, df, mask_fraction=0.2, scales=(1, 10, 100, 1000), strategies=None, n_trials=20):
+        """
+        Initializes the ImputationBenchmark instance with the cleaned dataframe.
+
+        Args:
+            df: The cleaned dataframe.
+            mask_fraction: Share of the known labels masked.
+            scales: Sizes of the benchmarked frames as multiples of df, 1 being the real data.
+            strategies: Names of the benchmarked strategies, STRATEGIES when not given.
+            n_trials: Number of Optuna trials of the tuned strategy.
+        """
+        self.df = df[Imputer.FEATURES + ['review_summary']].astype({'review_summary': object})
+        self.mask_fraction = mask_fraction
+        self.scales = scales
+        self.strategies = strategies if strategies is not None else self.STRATEGIES
+        self.n_trials = n_trials
+
+    def run(self):
+        """
+        Runs every strategy on every scale.
+
+        Returns:
+            A dataframe indexed by scale and strategy with the rows, fit time, predict time,
+            peak RSS and accuracy on the masked labels.
+        """
+        context = multiprocessing.get_context('spawn')
+        results = []
+        with context.Pool(1, maxtasksperchild=1) as pool:
+            for scale in self.scales:
+                for strategy in self.strategies:
+                    result = pool.apply(_impute_masked, (
+                        self.df, scale, strategy, self.mask_fraction, self.n_trials
+                    ))
+                    results.append(dict(result, scale=scale, strategy=strategy))
+        return pd.DataFrame(results).set_index(['scale', 'strategy'])
+
+
+class FilterBenchmark:
+    """
+    A class to time the dashboard filters on a catalogue resampled to a million games against
+    the interactive budget: resolving a filter to its rows with the FilterIndex, creating the
+    filtered view with its cubes and building the slowest of the charts drawn from the cubes.
+    Every run starts from empty view and figure caches, as the first visit of a filter does.
+
+    Attributes:
+        df: The cleaned dataframe.
+        n_rows: Number of games of the benchmarked catalogue.
+        filters: The (first year, last year, tags) filters timed.
+        repeat: Number of timed runs per filter, the fastest one is reported.
+    """
+    BUDGET_MS = 50
+    FILTERS = [
+        (2010, 2015, ()),
+        (None, None, ('Action', 'Indie')),
+        (2012, 2018, ('RPG',)),
+        (2005, 2020, ('Indie', 'Strategy', 'Casual')),
+    ]
+    # Charts drawn from the cubes, by the name of their figure method
+    CUBE_CHARTS = ['percentage_of_game_summary', 'revenue_by_genre', 'trends_game_tags', 'production_and_revenue_over_years']
+
+    def __init__(self, df, n_rows=1_000_000, filters=None, repeat=3):
+        """
+        Initializes the FilterBenchmark instance with the cleaned dataframe.
+
+        Args:
+            df: The cleaned dataframe.
+            n_rows: Number of games of the benchmarked catalogue.
+            filters: The (first year, last year, tags) filters timed, FILTERS when not given.
+            repeat: Number of timed runs per filter.
+        """
+        self.df = df
+        self.n_rows = n_rows
+        self.filters = filters if filters is not None else self.FILTERS
+        self.repeat = repeat
+
+    def run(self):
+        """
+        Builds the dashboard of the resampled catalogue once and times every filter.
+
+        Returns:
+            A dataframe indexed by filter with the matching games, the time to resolve the rows,
+            to create the view (resolving included) and to build the slowest cube chart, and
+            whether the view and that chart fit in BUDGET_MS.
+        """
+        # imported here, so that the cleaning and imputation benchmarks run without Dash installed
+        from modules.DashBoard import DashBoard
+
+        frame = synthetic_frame(self.df, -(-self.n_rows // len(self.df))).iloc[:self.n_rows]
+        board = DashBoard(frame)
+        results = []
+        for start, end, tags in self.filters:
+            year_range = None if start is None and end is None else [start, end]
+            timings = []
+            for _ in range(self.repeat):
+                board.filtered_views.clear()
+                board.figure_cache.clear()
+                begin = time.perf_counter()
+                rows = board.filter_index.rows(start, end, list(tags))
+                resolve_ms = (time.perf_counter() - begin) * 1000
+
+                begin = time.perf_counter()
+                view = board.filtered_visualizer(year_range, list(tags))
+                view_ms = (time.perf_counter() - begin) * 1000
+
+                chart_ms = 0.0
+                for chart in self.CUBE_CHARTS:
+                    begin = time.perf_counter()
+                    view.cached_figure(chart, getattr(view, f'{chart}_figure'))
+                    chart_ms = max(chart_ms, (time.perf_counter() - begin) * 1000)
+                timings.append((resolve_ms, view_ms, chart_ms))
+
+            resolve_ms, view_ms, chart_ms = (min(timing[i] for timing in timings) for i in range(3))
+            results.append({
+                'filter': f"{'all years' if year_range is None else f'{start}-{end}'} {'|'.join(tags)}".strip(),
+                'games': int(rows.sum()),
+                'resolve_ms': resolve_ms,
+                'view_ms': view_ms,
+                'slowest_chart_ms': chart_ms,
+                'within_budget': view_ms + chart_ms <= self.BUDGET_MS,
+            })
+        return pd.DataFrame(results).set_index('filter')
+
+
+def synthetic_frame(df, scale, seed=42):
+    """
+    Resamples the rows of a frame to scale times its size, jittering the numeric features
+    by a few percent so that the copies are not identical. Scale 1 returns the frame itself.
+    """
+    if scale == 1:
+        return df.reset_index(drop=True)
+    rng = np.random.default_rng(seed)
+    sample = df.iloc[rng.integers(0, len(df), len(df) * scale)].reset_index(drop=True)
+    for col in Imputer.FEATURES:
+        sample[col] = sample[col] * rng.lognormal(0.0, 0.05, len(sample))
+    return sample
+
+
+def _impute_masked(df, scale, strategy, mask_fraction, n_trials):
+    """
+    Masks labels of the (scaled) frame, imputes them with one strategy and measures the run.
+    """
+    df = synthetic_frame(df, scale)
+    rng = np.random.default_rng(0)
+    known = np.flatnonzero((df['review_summary'] != '').to_numpy())
+    masked = rng.choice(known, int(len(known) * mask_fraction), replace=False)
+    truth = df['review_summary'].to_numpy()[masked]
+    df.iloc[masked, df.columns.get_loc('review_summary')] = ''
+
+    start = time.perf_counter()
+    if strategy == 'majority':
+        majority = df.loc[df['review_summary'] != '', 'review_summary'].mode().iloc[0]
+        fit_time = time.perf_counter() - start
+        start = time.perf_counter()
+        predicted = df['review_summary'].replace('', majority)
+    else:
+        imputer = Imputer(df, strategy == 'tuned_hist', n_trials=n_trials, model_dir=None)
+        tree_method = strategy.split('_')[1]
+        imputer.FIXED_PARAMS = dict(Imputer.FIXED_PARAMS, tree_method=tree_method)
+        imputer.get_model()
+        fit_time = time.perf_counter() - start
+        start = time.perf_counter()
+        predicted = next(imputer.predict_chunks([df]))['review_summary']
+    predict_time = time.perf_counter() - start
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    peak_mb = peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+    return {
+        'rows': len(df),
+        'fit_s': fit_time,
+        'predict_s': predict_time,
+        'peak_rss_mb': round(peak_mb, 1),
+        'accuracy': (predicted.to_numpy()[masked] == truth).mean(),
+    }
@@ -1,28 +1,96 @@
 import dash
-from dash import Dash, dcc, html
+from dash import dcc, html
+from dash.dependencies import MATCH
+from flask import Response, abort, g
+from collections import OrderedDict, deque
+import hashlib
+import json
+import logging
 import random
+import threading
+import time
+import pandas as pd
 
 from modules.DataVisualizer import DataVisualizer
+from modules.FigureCache import FigureCache
+from modules.FigureEncoder import FigureEncoder
+from modules.FilterIndex import FilterIndex
 from modules.Categories import selected_categories
 
+logger = logging.getLogger(__name__)
+
 class DashBoard:
     """
     Creates a dashboard.
+
+    The charts can be filtered by a release year range and a tag selection. Filters are
+    resolved to rows by a FilterIndex and drawn by a view of the visualizer, whose cubes are
+    summed from the precomputed strata of the full ones (see DataVisualizer.view). The view of
+    every recent filter is kept, so that its figures are served from the figure cache when the
+    filter comes back.
+
+    Graphs fetch their figures from the figure cache, which serves the stored JSON as is and
+    rebuilds a figure evicted since its URL was handed out.
+    Every tab callback and figure response is measured: its size in bytes, the time spent
+    building the content and the time spent serializing it. The measures are logged and kept
+    in payload_log.
     """
-    def __init__(self, df):
+    # Number of filtered visualizers kept
+    MAX_FILTERED_VIEWS = 8
+
+    def __init__(self, df, tag_matrix=None, compact=True):
+        """
+        Initializes the DashBoard instance with the cleaned dataframe and builds the Dash app.
+
+        Args:
+            df: The cleaned dataframe.
+            tag_matrix: The TagMatrix built by DataCleaner, built from 'Tags' when not given or
+                when its rows are not the rows of df.
+            compact: Whether figures are sent in the compact encoding of FigureEncoder.
+        """
         self.df = df
         self.selected_categories = selected_categories
-        self.visualizer = DataVisualizer(self.df, self.selected_categories)
-        self.app = dash.Dash(__name__)
+        self.figure_cache = FigureCache(encoder=FigureEncoder() if compact else None)
+        self.payload_log = deque(maxlen=1000)
+        self.visualizer = DataVisualizer(self.df, self.selected_categories, tag_matrix, self.figure_cache)
+        self.filter_index = FilterIndex(self.df, self.visualizer.tag_matrix)
+        self.indexed_version = self.visualizer.version
+        self.filtered_views = OrderedDict()
+        self.filter_lock = threading.Lock()
+        # the controls of a tab only exist while it is shown
+        self.app = dash.Dash(__name__, suppress_callback_exceptions=True)
         self.app_layout()
         self.register_callbacks()  
 
     def app_layout(self):
         """
-        Configures the layout of the Dash application with tabs and dynamic content.
+        Configures the layout of the Dash application with the filters, tabs and dynamic content.
         """
+        first_year, last_year = self.filter_index.year_bounds()
+        # without any release year there is nothing to filter by, the slider is shown disabled
+        no_years = first_year is None
+        if no_years:
+            first_year = last_year = 0
+        counts = self.visualizer.tag_matrix.tag_counts()
+        tags = sorted(tag for tag in counts.index[counts > 0] if tag != '')
+
         self.app.layout = html.Div([
             html.H1("Analysis of Steam Games and their Categories", style={"textAlign": "center"}),
+            html.Div([
+                html.Label("Release years:"),
+                dcc.RangeSlider(
+                    id='year-range',
+                    min=first_year,
+                    max=last_year,
+                    step=1,
+                    value=[first_year, last_year],
+                    marks={} if no_years else {year: str(year) for year in range(first_year, last_year + 1) if year % 5 == 0},
+                    tooltip={"placement": "bottom"},
+                    disabled=no_years
+                ),
+                html.Label("Tags:"),
+                dcc.Dropdown(id='tag-filter', options=tags, multi=True, placeholder="All tags"),
+            ], style={"padding": "10px"}),
             dcc.Tabs(
                 id='tabs', 
                 value='Introduction',  
@@ -44,32 +112,239 @@ class DashBoard:
 
     def register_callbacks(self):
         """
-        Registers callbacks to dynamically update tab content based on the selected tab.
+        Registers callbacks to dynamically update tab content based on the selected tab and
+        filters, and the scatter plot based on the selected revenue threshold.
         """
         @self.app.callback(
             dash.dependencies.Output('tab-content', 'children'),  
-            [dash.dependencies.Input('tabs', 'value')] 
+            [dash.dependencies.Input('tabs', 'value'),
+             dash.dependencies.Input('year-range', 'value'),
+             dash.dependencies.Input('tag-filter', 'value')]
         )
-        def update_content(tab_name):
+        def update_content(tab_name, year_range, tags):
             """
-            Returns the appropriate content for the selected tab.
+            Returns the appropriate content for the selected tab and filters.
             """
-            if tab_name == 'Introduction':
-                return self.visualizer.introduction
-            elif tab_name == 'pie_chart':
-                return self.visualizer.percentage_of_game_summary
-            elif tab_name == 'top_games_comparison':
-                return self.visualizer.top_games_comparison
-            elif tab_name == 'revenue_by_genre':
-                return self.visualizer.revenue_by_genre
-            elif tab_name == 'line_plot':
-                return self.visualizer.trends_game_tags
-            elif tab_name == 'bubble_chart':
-                return self.visualizer.reviews_vs_revenue_over_time
-            elif tab_name == 'num_of_games_and_their_revenues':
-                return self.visualizer.production_and_revenue_over_years
+            start = time.perf_counter()
+            visualizer = self.filtered_visualizer(year_range, tags)
+            if visualizer is None:
+                content = html.Div("No games match the selected filters.")
             else:
-                return html.Div("Tab not found.")
+                content = self.tab_content(tab_name, visualizer)
+            self.track_payload(tab_name, start)
+            return content
+
+        @self.app.callback(
+            dash.dependencies.Output({'type': 'figure-url', 'chart': 'reviews_vs_revenue_over_time'}, 'data'),
+            [dash.dependencies.Input('revenue-threshold', 'value')],
+            [dash.dependencies.State('year-range', 'value'),
+             dash.dependencies.State('tag-filter', 'value')]
+        )
+        def update_revenue_scatter(position, year_range, tags):
+            """
+            Returns the figure URL of the scatter plot of the selected revenue threshold and filters.
+            """
+            start = time.perf_counter()
+            visualizer = self.filtered_visualizer(year_range, tags)
+            if visualizer is None:
+                return dash.no_update
+            url = visualizer.revenue_scatter_url(position)
+            self.track_payload('bubble_chart', start)
+            return url
+
+        # graphs fetch their figure JSON from the figure cache (see DataVisualizer.graph)
+        self.app.clientside_callback(
+            """
+            function(url) {
+                if (!url) {
+                    return window.dash_clientside.no_update;
+                }
+                return fetch(url).then(function(response) {
+                    return response.ok ? response.json() : window.dash_clientside.no_update;
+                });
+            }
+            """,
+            dash.dependencies.Output({'type': 'cached-figure', 'chart': MATCH}, 'figure'),
+            dash.dependencies.Input({'type': 'figure-url', 'chart': MATCH}, 'data')
+        )
+
+        @self.app.server.route(FigureCache.ROUTE + '<key>.json')
+        def serve_figure(key):
+            """
+            Serves the cached JSON of a figure as is, rebuilding it when it was evicted. The key
+            determines the figure, so browsers may keep it for good.
+            """
+            start = time.perf_counter()
+            entry = self.figure_cache.get(key)
+            if entry is None:
+                abort(404)
+            chart, text = entry
+            response = Response(text, mimetype='application/json')
+            response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+            self.track_payload(f'figure:{chart}', start)
+            return response
+
+        @self.app.server.route(DataVisualizer.IMAGE_ROUTE + 'word_cloud-<version>.png')
+        def serve_word_cloud(version):
+            """
+            Serves the word cloud PNG of a data version. The version determines the image, so
+            browsers may keep it for good.
+            """
+            start = time.perf_counter()
+            visualizer = self.visualizer_of(version)
+            if visualizer is None:
+                abort(404)
+            response = Response(visualizer.word_cloud_image(), mimetype='image/png')
+            response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+            self.track_payload('image:word_cloud', start)
+            return response
+
+        @self.app.server.after_request
+        def log_payload(response):
+            """
+            Records the size and serialization time of tab callback, figure and image responses.
+            """
+            payload = g.pop('payload', None)
+            if payload is not None:
+                # Dash serializes the callback output between its return and this hook
+                serialize_ms = (time.perf_counter() - payload.pop('returned')) * 1000
+                entry = dict(payload, bytes=response.calculate_content_length(), serialize_ms=serialize_ms)
+                self.payload_log.append(entry)
+                logger.info(
+                    "tab %s: %d bytes, built in %.1f ms, serialized in %.1f ms",
+                    entry['tab'], entry['bytes'], entry['build_ms'], entry['serialize_ms']
+                )
+            return response
+
+    def filter_key(self, year_range, tags):
+        """
+        Normalizes the values of the filter controls. A year range spanning every release year
+        is no year filter, which keeps the games without a release date, and so is any range when
+        no game has a release year.
+
+        Returns:
+            A tuple of the first year, the last year and the sorted tags.
+        """
+        start, end = year_range if year_range else (None, None)
+        first_year, last_year = self.filter_index.year_bounds()
+        if first_year is None:
+            start, end = None, None
+        elif (start is None or start <= first_year) and (end is None or end >= last_year):
+            start, end = None, None
+        return start, end, tuple(sorted(tags or ()))
+
+    def filtered_visualizer(self, year_range, tags):
+        """
+        Returns the visualizer of the games matching the filters.
+
+        Args:
+            year_range: The selected [first, last] release years.
+            tags: The selected tags, a game matches when it has any of them.
+
+        Returns:
+            The DataVisualizer of the matching games, None when no game matches.
+        """
+        # a frame marked as changed by mark_dirty rebuilds the visualizer, and with it the index
+        self.visualizer.refresh()
+        with self.filter_lock:
+            if self.indexed_version != self.visualizer.version:
+                self.filter_index = FilterIndex(self.df, self.visualizer.tag_matrix)
+                self.indexed_version = self.visualizer.version
+                self.filtered_views.clear()
+
+        key = self.filter_key(year_range, tags)
+        if key == (None, None, ()):
+            return self.visualizer
+
+        with self.filter_lock:
+            if key in self.filtered_views:
+                self.filtered_views.move_to_end(key)
+                return self.filtered_views[key]
+
+        start = time.perf_counter()
+        rows = self.filter_index.rows(key[0], key[1], list(key[2]))
+        logger.info("filter %s: %d games resolved in %.1f ms", key, rows.sum(), (time.perf_counter() - start) * 1000)
+        if not rows.any():
+            return None
+
+        # the stamp of a filtered view follows from the stamp of the full data and the filter
+        version = hashlib.sha256(json.dumps([self.visualizer.version, key]).encode()).hexdigest()
+        visualizer = self.visualizer.view(rows, version, *key)
+        with self.filter_lock:
+            self.filtered_views[key] = visualizer
+            self.filtered_views.move_to_end(key)
+            while len(self.filtered_views) > self.MAX_FILTERED_VIEWS:
+                self.filtered_views.popitem(last=False)
+        return visualizer
+
+    def mark_dirty(self):
+        """
+        Marks the dataframe as changed in place, so that the visualizer, the filter index and
+        the filtered views are rebuilt before the next figure is served.
+        """
+        self.visualizer.mark_dirty()
+        return None
+
+    def visualizer_of(self, version):
+        """
+        Returns the unfiltered or kept filtered visualizer of a data version, None when there is none.
+        """
+        if self.visualizer.version == version:
+            return self.visualizer
+        with self.filter_lock:
+            for visualizer in self.filtered_views.values():
+                if visualizer.version == version:
+                    return visualizer
+        return None
+
+    def tab_content(self, tab_name, visualizer=None):
+        """
+        Returns the content of a tab, drawn by the given visualizer or the unfiltered one. The
+        introduction describes every game, so it and its word cloud come from the unfiltered one.
+        """
+        if visualizer is None:
+            visualizer = self.visualizer
+        if tab_name == 'Introduction':
+            return self.visualizer.introduction
+        elif tab_name == 'pie_chart':
+            return visualizer.percentage_of_game_summary
+        elif tab_name == 'top_games_comparison':
+            return visualizer.top_games_comparison
+        elif tab_name == 'revenue_by_genre':
+            return visualizer.revenue_by_genre
+        elif tab_name == 'line_plot':
+            return visualizer.trends_game_tags
+        elif tab_name == 'bubble_chart':
+            return visualizer.reviews_vs_revenue_over_time
+        elif tab_name == 'num_of_games_and_their_revenues':
+            return visualizer.production_and_revenue_over_years
+        else:
+            return html.Div("Tab not found.")
+
+    def track_payload(self, tab_name, start):
+        """
+        Marks the current request as a tab response to be measured by the after_request hook.
+
+        Args:
+            tab_name: The tab whose content is returned.
+            start: perf_counter value at which building the content started.
+        """
+        now = time.perf_counter()
+        g.payload = {'tab': tab_name, 'build_ms': (now - start) * 1000, 'returned': now}
+        return None
+
+    def payload_report(self):
+        """
+        Summarizes the measured tab responses.
+
+        Returns:
+            A dataframe indexed by tab with the number of responses and their mean bytes,
+            build and serialization times.
+        """
+        log = pd.DataFrame(list(self.payload_log), columns=['tab', 'bytes', 'build_ms', 'serialize_ms'])
+        report = log.groupby('tab').mean()
+        report.insert(0, 'responses', log.groupby('tab').size())
+        return report
 
     def run(self):
         """
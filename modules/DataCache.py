@@ -0,0 +1,120 @@
+import modules.DataCleaner
+import modules.DataIntegrator
+
+import hashlib
+import inspect
+import os
+import pandas as pd
+
+class DataCache:
+    """
+    A class to persist the cleaned dataframe as a Parquet file keyed by the content of its inputs.
+
+    The key is a hash of the input files together with the source code of the cleaning modules,
+    so editing either the data or the cleaner invalidates the cached frame.
+
+    Attributes:
+        cache_dir: Directory where the cached Parquet files are stored.
+    """
+    PREFIX = 'cleaned-'
+    # Modules whose code decides what the cleaned frame looks like
+    CODE_MODULES = [modules.DataCleaner, modules.DataIntegrator]
+
+    def __init__(self, cache_dir='cache'):
+        """
+        Initializes the DataCache instance with a cache directory.
+
+        Args:
+            cache_dir: Directory where the cached Parquet files are stored.
+        """
+        self.cache_dir = cache_dir
+
+    def code_version(self):
+        """
+        Hashes the source code of the cleaning modules.
+
+        Returns:
+            A hex digest identifying the current version of the cleaner.
+        """
+        digest = hashlib.sha256()
+        for module in self.CODE_MODULES:
+            digest.update(inspect.getsource(module).encode())
+        return digest.hexdigest()
+
+    def key(self, paths):
+        """
+        Computes the cache key of a set of input files.
+
+        Args:
+            paths: Paths of the input csv files.
+
+        Returns:
+            A hex digest of the file contents and the cleaner's code version.
+        """
+        digest = hashlib.sha256(self.code_version().encode())
+        for path in paths:
+            # every file is hashed on its own, so moving bytes from one file to the next changes the key
+            file_digest = hashlib.sha256()
+            with open(path, 'rb') as file:
+                for block in iter(lambda: file.read(2 ** 20), b''):
+                    file_digest.update(block)
+            digest.update(file_digest.digest())
+        return digest.hexdigest()[:32]
+
+    def path(self, key):
+        """
+        Returns the Parquet file path of a cache key.
+        """
+        return os.path.join(self.cache_dir, f'{self.PREFIX}{key}.parquet')
+
+    def remove_stale(self, key):
+        """
+        Deletes every cached frame which does not belong to the given key.
+
+        Args:
+            key: The cache key to keep.
+        """
+        if not os.path.isdir(self.cache_dir):
+            return None
+        keep = os.path.basename(self.path(key))
+        for name in os.listdir(self.cache_dir):
+            if name.startswith(self.PREFIX) and name != keep:
+                os.remove(os.path.join(self.cache_dir, name))
+        return None
+
+    def save(self, df, key):
+        """
+        Writes the cleaned dataframe to the cache.
+
+        Args:
+            df: The cleaned dataframe.
+            key: The cache key of its inputs.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        # written next to the target first so that a crash never leaves a truncated entry
+        target = self.path(key)
+        df.to_parquet(target + '.tmp')
+        os.replace(target + '.tmp', target)
+        return None
+
+    def load_or_build(self, paths, build):
+        """
+        Loads the cleaned dataframe from the cache, or builds and caches it when the entry is
+        missing or stale.
+
+        Args:
+            paths: Paths of the input csv files.
+            build: A callable which returns the cleaned dataframe.
+
+        Returns:
+            The cleaned dataframe.
+        """
+        key = self.key(paths)
+        if os.path.exists(self.path(key)):
+            return pd.read_parquet(self.path(key))
+
+        self.remove_stale(key)
+        df = build()
+        self.save(df, key)
+        return df
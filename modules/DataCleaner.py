@@ -1,9 +1,8 @@
 from modules.DataIntegrator import DataIntegrator
+from modules.TagMatrix import TagMatrix
 
-from datetime import datetime
 import pandas as pd
 import numpy as np
-import re
 
 class DataCleaner:
     """
@@ -14,7 +13,39 @@ class DataCleaner:
         df2: The second dataframe for integration.
         integrator: An instance of DataIntegrator for merging data.
         df: The resulting dataframe after integration.
+        tag_matrix: Sparse game x tag matrix built by integrate_columns, aligned to the rows of the
+            cleaned dataframe by clean_data.
+        inplace: Whether stages drop columns and rows in place instead of assigning a new frame (pipeline mode).
     """
+    # Columns which are never used by the analysis
+    COLUMNS_TO_DROP = [
+        'types', 'discount_price', 'developer', 'recent_reviews', 'Reviews D7', 'Reviews D30', 'Reviews D90', 'name_slug',
+        'desc_snippet', 'mature_content', 'achievements', 'publisher', 'Modified Tags', 'App ID', 'Steam Page',
+        'minimum_requirements', 'recommended_requirements', 'languages', 'genre',
+        'game_description', 'discount_price', 'game_details'
+        ]
+    # Columns read and created by every stage, in the order the stages run (see plan)
+    STAGE_COLUMNS = {
+        'fill_missing_values': (['all_reviews', 'release_date', 'popular_tags', 'Tags'], []),
+        'format_date:release_date': (['release_date'], []),
+        'format_date:Release Date': (['Release Date'], []),
+        'fill_game_names': (['name', 'url'], []),
+        'integrate_columns': (['popular_tags', 'Tags'], []),
+        'combine_cols:Release Date': (['Release Date', 'release_date'], []),
+        'combine_cols:name': (['name', 'Title'], []),
+        'combine_cols:Launch Price': (['Launch Price', 'original_price'], []),
+        'convert_price_to_float': (['Launch Price'], ['launch_price']),
+        'convert_reviews_to_float': (['Reviews Score Fancy'], ['review_score']),
+        'drop_null_values': (['Release Date'], []),
+        'convert_revenue_to_float': (['Revenue Estimated'], []),
+        'add_review_summary': (['all_reviews'], ['review_summary']),
+        'fill_null_of_all_reviews': (['all_reviews', 'Reviews Total', 'review_score'], []),
+        'fill_review_score_reviews_total': (['Reviews Total', 'review_score'], []),
+    }
+    # Columns of the cleaned dataframe
+    OUTPUT_COLUMNS = [
+        'name', 'Reviews Total', 'Release Date', 'Tags', 'Revenue Estimated', 'launch_price', 'review_score', 'review_summary'
+        ]
 
     def __init__(self, df1, df2):
         """
@@ -28,6 +59,105 @@ class DataCleaner:
         self.df2 = df2
         self.integrator = DataIntegrator(self.df1, self.df2)
         self.df = self.integrator.merge_dataframes()
+        self.tag_matrix = None
+        self.inplace = False
+
+    @classmethod
+    def from_merged(cls, df):
+        """
+        Creates a DataCleaner around a dataframe which has already been merged.
+
+        Args:
+            df: The merged dataframe.
+
+        Returns:
+            A DataCleaner instance working on the given dataframe.
+        """
+        cleaner = cls.__new__(cls)
+        cleaner.df1 = None
+        cleaner.df2 = None
+        cleaner.integrator = None
+        cleaner.df = df
+        cleaner.tag_matrix = None
+        cleaner.inplace = False
+        return cleaner
+
+    @classmethod
+    def plan(cls):
+        """
+        Works out which source columns the stages and the cleaned dataframe need. Columns created
+        by a stage (e.g. 'review_summary') are not source columns.
+
+        Returns:
+            A list of the source column names, in the order they are first needed.
+        """
+        needed = []
+        created = set()
+        for reads, creates in cls.STAGE_COLUMNS.values():
+            needed += [col for col in reads if col not in created and col not in needed]
+            created.update(creates)
+        needed += [col for col in cls.OUTPUT_COLUMNS if col not in created and col not in needed]
+        return needed
+
+    @classmethod
+    def pipeline(cls, df1, df2, profiler=None):
+        """
+        Cleans the dataframes in pipeline mode: columns no stage needs are pruned before the merge,
+        and stages drop columns and rows in place on the merged frame instead of assigning a new
+        filtered frame. Column drops split the blocks into views; row drops still let pandas
+        rebuild the blocks of the kept rows. Gives the same cleaned dataframe as clean_data,
+        without columns outside OUTPUT_COLUMNS.
+
+        Args:
+            df1: The first dataframe.
+            df2: The second dataframe.
+            profiler: Optional StageProfiler which measures every stage.
+
+        Returns:
+            The cleaned dataframe.
+        """
+        needed = cls.plan()
+        df1 = df1[[col for col in df1.columns if col in needed]]
+        df2 = df2[[col for col in df2.columns if col in needed or col == 'App ID']]
+
+        cleaner = cls(df1, df2)
+        cleaner.inplace = True
+        return cleaner.clean_data(profiler)
+
+    def drop_columns(self, columns):
+        """
+        Drops columns, in place when running in pipeline mode.
+
+        Args:
+            columns: List of column names to drop.
+
+        Returns:
+            The updated dataframe.
+        """
+        if self.inplace:
+            # del splits the column blocks into views instead of copying every other column
+            for col in columns:
+                del self.df[col]
+        else:
+            self.df = self.df.drop(columns, axis=1)
+        return self.df
+
+    def drop_rows(self, keep):
+        """
+        Drops the rows outside a mask, in place when running in pipeline mode.
+
+        Args:
+            keep: Boolean mask of the rows to keep.
+
+        Returns:
+            The updated dataframe.
+        """
+        if self.inplace:
+            # the merged frame has a unique index, so dropping by label drops exactly these rows
+            self.df.drop(index=self.df.index[~keep], inplace=True)
+        else:
+            self.df = self.df[keep]
+        return self.df
 
     def fill_game_names(self):
         """
@@ -41,10 +171,11 @@ class DataCleaner:
                 return url.split('/')[-2]
             return np.nan
 
-        self.df['name'] = self.df.apply(lambda row: parse_game_name(row['url']) if pd.isnull(row['name']) else row['name'], axis=1)
+        missing = self.df['name'].isna()
+        parsed = self.df.loc[missing, 'url'].apply(parse_game_name)
+        self.df['name'] = self.df['name'].where(~missing, parsed)
         self.df['name'] = self.df['name'].apply(lambda x: x.replace("_", " ") if isinstance(x, str) else x)
-        self.df = self.df.drop('url', axis=1)
-        return self.df
+        return self.drop_columns(['url'])
 
     def drop_unnecessary_columns(self):
         """
@@ -53,35 +184,34 @@ class DataCleaner:
         Returns:
             The updated dataframe with unnecessary columns removed.
         """
-        columns_to_drop = [
-            'types', 'discount_price', 'developer', 'recent_reviews', 'Reviews D7', 'Reviews D30', 'Reviews D90', 'name_slug',
-            'desc_snippet', 'mature_content', 'achievements', 'publisher', 'Modified Tags', 'App ID', 'Steam Page',
-            'minimum_requirements', 'recommended_requirements', 'languages', 'genre',
-            'game_description', 'discount_price', 'game_details'
-            ]
+        if self.inplace:
+            return self.drop_columns([col for col in self.df.columns if pd.isna(col) or col in self.COLUMNS_TO_DROP])
+
         self.df = self.df.loc[:, ~self.df.columns.isna()]
-        self.df = self.df.drop(columns=columns_to_drop, axis=1)
+        # columns may already have been skipped while reading the csv files
+        self.df = self.df.drop(columns=self.COLUMNS_TO_DROP, axis=1, errors='ignore')
         return self.df
 
-    def format_date(self, date_col):
+    def format_date(self, date_col, date_format="%b %d, %Y", errors='coerce'):
         """
-        Formats date strings in a specified column to datetime objects.
+        Formats date strings in a specified column to datetime64 values.
+        Release dates repeat a lot, so every distinct string is only parsed once.
  
         Args:
             date_col: The column name containing date strings.
+            date_format: The strptime format of the dates, 'mixed' to infer it per date.
+            errors: 'coerce' to turn unparsable dates into NaT, 'raise' to fail on them.
 
         Returns:
             The updated dataframe with formatted dates.
         """
-        def parse_date(date_str):
-            if pd.isnull(date_str):
-                return np.nan
-            try:
-                return datetime.strptime(date_str.strip(), "%b %d, %Y").date()
-            except ValueError:
-                return np.nan
+        codes, uniques = pd.factorize(self.df[date_col])
+        stripped = [date_str.strip() if isinstance(date_str, str) else None for date_str in uniques]
+        parsed = pd.to_datetime(pd.Series(stripped, dtype=object), format=date_format, errors=errors)
 
-        self.df[date_col] = self.df[date_col].apply(parse_date)
+        # code -1 marks missing values and picks the NaT appended at the end
+        parsed = np.append(parsed.to_numpy(dtype='datetime64[ns]'), np.datetime64('NaT', 'ns'))
+        self.df[date_col] = parsed[codes]
         return self.df
 
     def fill_missing_values(self, missing_columns):
@@ -99,23 +229,24 @@ class DataCleaner:
 
     def integrate_columns(self):
         """
-        Integrates tags from multiple columns into a single column.
+        Integrates tags from multiple columns into a single column and builds the sparse
+        game x tag matrix of the integrated tags.
 
         Returns:
             The updated dataframe with integrated tags.
         """
-        def join_tags(row):
-            tags1 = row['popular_tags'].split(',')
-            tags2 = row['Tags'].split(',')
+        def join_tags(popular_tags, tags):
+            tags1 = popular_tags.split(',')
+            tags2 = tags.split(',')
 
             tags1 = [tag.strip() for tag in tags1 if tag.strip()]
             tags2 = [tag.strip() for tag in tags2 if tag.strip()]
 
             return ','.join(list(set(tags2 + tags1)))
 
-        self.df['Tags'] = self.df.apply(join_tags, axis=1)
-        self.df = self.df.drop('popular_tags', axis=1)
-        return self.df
+        self.df['Tags'] = [join_tags(popular_tags, tags) for popular_tags, tags in zip(self.df['popular_tags'], self.df['Tags'])]
+        self.tag_matrix = TagMatrix.from_tags(self.df['Tags'])
+        return self.drop_columns(['popular_tags'])
 
     def combine_cols(self, col1, col2):
         """
@@ -129,8 +260,27 @@ class DataCleaner:
             The updated dataframe with combined columns.
         """
         self.df[col1] = self.df[col1].combine_first(self.df[col2])
-        self.df = self.df.drop(col2, axis=1)
-        return self.df
+        return self.drop_columns([col2])
+
+    def strings_to_float(self, column, strip_pattern):
+        """
+        Converts a column of strings to floats in one pass over the column. Characters matching
+        strip_pattern are removed and ',' is read as the decimal separator.
+
+        Args:
+            column: The series to convert.
+            strip_pattern: Regex of the characters to remove before converting.
+
+        Returns:
+            A float series, NaN where the value was not a string.
+        """
+        text_kinds = ['string', 'empty', 'mixed', 'mixed-integer']
+        is_text = pd.api.types.is_object_dtype(column) or isinstance(column.dtype, pd.StringDtype)
+        if not is_text or pd.api.types.infer_dtype(column, skipna=True) not in text_kinds:
+            return pd.Series(np.nan, index=column.index)
+
+        cleaned = column.str.replace(strip_pattern, '', regex=True).str.replace(',', '.', regex=False)
+        return cleaned.astype(float)
 
     def convert_reviews_to_float(self):
         """
@@ -139,15 +289,8 @@ class DataCleaner:
         Returns:
             The updated dataframe with review scores as floats.
         """
-        def parse_reviews(review_score):
-            try:
-                return float(review_score.replace('%', '').replace(',', '.'))
-            except AttributeError:
-                return np.nan
-
-        self.df['review_score'] = self.df['Reviews Score Fancy'].apply(parse_reviews)
-        self.df = self.df.drop('Reviews Score Fancy', axis=1)
-        return self.df
+        self.df['review_score'] = self.strings_to_float(self.df['Reviews Score Fancy'], r'%')
+        return self.drop_columns(['Reviews Score Fancy'])
 
     def convert_price_to_float(self):
         """
@@ -163,8 +306,7 @@ class DataCleaner:
         )
 
         self.df['launch_price'] = pd.to_numeric(self.df['launch_price'], errors='coerce').fillna(0)
-        self.df = self.df.drop('Launch Price', axis=1)
-        return self.df
+        return self.drop_columns(['Launch Price'])
 
     def drop_null_values(self):
         """
@@ -173,8 +315,7 @@ class DataCleaner:
         Returns:
             The updated dataframe with null values removed.
         """
-        self.df = self.df.dropna(subset=['Release Date'])
-        return self.df
+        return self.drop_rows(self.df['Release Date'].notna().to_numpy())
 
     def convert_revenue_to_float(self):
         """
@@ -183,14 +324,7 @@ class DataCleaner:
         Returns:
             The updated dataframe with revenue as floats.
         """
-        def parse_revenue(rev_str):
-            if isinstance(rev_str, str):
-                rev_str = re.sub(r'[^\d,]', '', rev_str).replace(',', '.')
-                return float(rev_str)
-            else:
-                return np.nan
-
-        self.df['Revenue Estimated'] = self.df['Revenue Estimated'].apply(parse_revenue)
+        self.df['Revenue Estimated'] = self.strings_to_float(self.df['Revenue Estimated'], r'[^\d,]')
         return self.df
 
     def add_review_summary(self):
@@ -201,7 +335,11 @@ class DataCleaner:
             The updated dataframe with the review summary column.
         """
         self.df['review_summary'] = self.df['all_reviews'].str.split(',').str[0]
-        self.df.replace(r'^\d+ user reviews$', '', regex=True, inplace=True)
+        if self.inplace:
+            # only review_summary can hold a bare '<n> user reviews' summary
+            self.df['review_summary'] = self.df['review_summary'].replace(r'^\d+ user reviews$', '', regex=True)
+        else:
+            self.df.replace(r'^\d+ user reviews$', '', regex=True, inplace=True)
         return self.df
 
     def fill_null_of_all_reviews(self):
@@ -211,25 +349,14 @@ class DataCleaner:
         Returns:
             The updated dataframe with missing review data filled.
         """
-        def extract_data(row):
-            count_match = re.search(r"\(([\d,]+)\)", row)
-            score_match = re.search(r"(\d+)%", row)
-
-            count = int(count_match.group(1).replace(",", "")) if count_match else np.nan
-            score = int(score_match.group(1)) if score_match else np.nan
-
-            return count, score
+        # e.g. 'Very Positive,(42,550),- 92% of the 42,550 user reviews for this game are positive.'
+        counts = self.df['all_reviews'].str.extract(r"\(([\d,]+)\)", expand=False).str.replace(",", "", regex=False)
+        scores = self.df['all_reviews'].str.extract(r"(\d+)%", expand=False)
 
-        for index, row in self.df.iterrows():
-            if pd.isna(self.df.at[index, "Reviews Total"]) or pd.isna(self.df.at[index, "review_score"]):
-                count, score = extract_data(row["all_reviews"])
-                if pd.isna(self.df.at[index, "Reviews Total"]):
-                    self.df.at[index, "Reviews Total"] = count
-                if pd.isna(self.df.at[index, "review_score"]):
-                    self.df.at[index, "review_score"] = score
+        self.df["Reviews Total"] = self.df["Reviews Total"].fillna(pd.to_numeric(counts, errors='coerce'))
+        self.df["review_score"] = self.df["review_score"].fillna(pd.to_numeric(scores, errors='coerce'))
 
-        self.df = self.df.drop('all_reviews', axis=1)
-        return self.df
+        return self.drop_columns(['all_reviews'])
 
     def fill_review_score_reviews_total(self):
         """
@@ -238,39 +365,85 @@ class DataCleaner:
         Returns:
             The updated dataframe with filled review data.
         """
-        self.df = self.df[(self.df['Reviews Total'] != 0) & (self.df['review_score'] != 0)]
+        self.drop_rows(((self.df['Reviews Total'] != 0) & (self.df['review_score'] != 0)).to_numpy())
 
         self.df["Reviews Total"] = self.df["Reviews Total"].fillna(self.df["Reviews Total"].median()) # Data was skewed for this feature
         self.df["review_score"] = self.df["review_score"].fillna(self.df["review_score"].mean())
         return self.df
 
-    def clean_data(self):
+    def row_wise_actions(self):
+        """
+        Lists the cleaning actions which only look at one row at a time, in the order they run.
+        These can be applied to any subset of the merged rows independently.
+
+        Returns:
+            A list of (stage name, callable) pairs, each callable returning the updated dataframe.
+        """
+        return [
+            ('drop_unnecessary_columns', lambda: self.drop_unnecessary_columns()),
+            ('fill_missing_values', lambda: self.fill_missing_values(missing_columns=['all_reviews', 'release_date', 'popular_tags', 'Tags'])),
+            ('format_date:release_date', lambda: self.format_date('release_date')),
+            ('format_date:Release Date', lambda: self.format_date('Release Date', date_format='mixed', errors='raise')),
+            ('fill_game_names', lambda: self.fill_game_names()),
+            ('integrate_columns', lambda: self.integrate_columns()),
+            ('combine_cols:Release Date', lambda: self.combine_cols('Release Date', 'release_date')),
+            ('combine_cols:name', lambda: self.combine_cols('name', 'Title')),
+            ('combine_cols:Launch Price', lambda: self.combine_cols('Launch Price', 'original_price')),
+            ('convert_price_to_float', lambda: self.convert_price_to_float()),
+            ('convert_reviews_to_float', lambda: self.convert_reviews_to_float()),
+            ('drop_null_values', lambda: self.drop_null_values()),
+            ('convert_revenue_to_float', lambda: self.convert_revenue_to_float()),
+            ('add_review_summary', lambda: self.add_review_summary()),
+            ('fill_null_of_all_reviews', lambda: self.fill_null_of_all_reviews()),
+        ]
+
+    def run_actions(self, actions, profiler=None):
+        """
+        Executes named cleaning actions one by one.
+
+        Args:
+            actions: A list of (stage name, callable) pairs.
+            profiler: Optional StageProfiler which measures every stage.
+
+        Returns:
+            The dataframe after the last action.
+        """
+        for name, action in actions:
+            if profiler is None:
+                self.df = action()
+            else:
+                self.df = profiler.run(name, action, self.df)
+        return self.df
+
+    def clean_rows(self, profiler=None):
+        """
+        Executes the row wise cleaning actions, leaving out the ones which need the whole table.
+
+        Args:
+            profiler: Optional StageProfiler which measures every stage.
+
+        Returns:
+            The dataframe with every row wise action applied.
+        """
+        return self.run_actions(self.row_wise_actions(), profiler)
+
+    def clean_data(self, profiler=None):
         """
         Executes a sequence of cleaning actions on the dataframe.
 
+        Args:
+            profiler: Optional StageProfiler which measures every stage.
+
         Returns:
             The final fully cleaned dataframe.
         """
 
         # Actions to done one by one (cleaning)
-        actions = [
-            lambda: self.drop_unnecessary_columns(),
-            lambda: self.fill_missing_values(missing_columns=['all_reviews', 'release_date', 'popular_tags', 'Tags']),
-            lambda: self.format_date('release_date'),
-            lambda: self.fill_game_names(),
-            lambda: self.integrate_columns(),
-            lambda: self.combine_cols('Release Date', 'release_date'),
-            lambda: self.combine_cols('name', 'Title'),
-            lambda: self.combine_cols('Launch Price', 'original_price'),
-            lambda: self.convert_price_to_float(),
-            lambda: self.convert_reviews_to_float(),
-            lambda: self.drop_null_values(),
-            lambda: self.convert_revenue_to_float(),
-            lambda: self.add_review_summary(),
-            lambda: self.fill_null_of_all_reviews(),
-            lambda: self.fill_review_score_reviews_total(),
+        actions = self.row_wise_actions() + [
+            ('fill_review_score_reviews_total', lambda: self.fill_review_score_reviews_total()),
         ]
-
-        for action in actions:
-            self.df = action()
+        self.run_actions(actions, profiler)
+        # the matrix was built before the rows were dropped
+        if self.tag_matrix is not None:
+            self.tag_matrix = self.tag_matrix.align(self.df.index)
         return self.df
@@ -7,7 +7,12 @@ class DataIntegrator:
     Attributes:
         df1: The first dataframe to merge.
         df2: The second dataframe to merge.
+        app_id_index: The App ID index of the second dataframe, rebuilt by every merge.
+        merge_report: Counts of matched and orphaned rows from the last merge.
     """
+    # App ID is the fifth '/' separated part of a store url (https://store.steampowered.com/app/<id>/<name>/)
+    APP_ID_PATTERN = r'^(?:[^/]*/){4}\s*([+-]?\d+)\s*(?:/|$)'
+
     def __init__(self, df1, df2):
         """
         Initializes the DataIntegrator instance with two dataframes.
@@ -18,25 +23,36 @@ class DataIntegrator:
         """
         self.df1 = df1
         self.df2 = df2
+        self.app_id_index = None
+        self.merge_report = None
 
-    def retrive_app_id(self, url):
+    def extract_app_ids(self, urls):
         """
-        Extracts the App ID from a URL.
+        Extracts the App IDs from a column of URLs in a single vectorized pass.
 
         Args:
-            url: The URL string .
+            urls: The series of URL strings.
+
+        Returns:
+            A nullable integer (Int64) series of App IDs, <NA> where no App ID could be extracted.
+        """
+        if not (pd.api.types.is_object_dtype(urls) or pd.api.types.is_string_dtype(urls)):
+            return pd.Series(pd.NA, index=urls.index, dtype='Int64')
+        app_ids = urls.str.extract(self.APP_ID_PATTERN, expand=False)
+        return pd.to_numeric(app_ids, errors='coerce').astype('Int64')
+
+    def build_app_id_index(self):
+        """
+        Keys the second dataframe by its App ID so that it can be joined against directly.
+        Called by every merge, so that changes to the second dataframe are picked up.
 
         Returns:
-            The App ID as an integer if extracted successfully, otherwise an empty string.
+            The second dataframe indexed by a nullable integer App ID.
         """
-        if isinstance(url, str):
-            parts = url.split('/')
-            if len(parts) > 4:
-                try:
-                    return int(parts[4])
-                except ValueError:
-                    return ''
-        return ''
+        right = self.df2.set_index(self.df2['App ID'].astype('Int64'))
+        right = right.drop('App ID', axis=1)
+        self.app_id_index = right.index
+        return right
 
     def merge_dataframes(self):
         """
@@ -47,6 +63,15 @@ class DataIntegrator:
         """
 
         # Merging dataframes based on app id.
-        self.df1['App ID'] = self.df1['url'].apply(self.retrive_app_id)
-        merged_df = pd.merge(self.df1, self.df2, on='App ID', how='outer')
-        return merged_df
+        self.df1['App ID'] = self.extract_app_ids(self.df1['url'])
+        right = self.build_app_id_index()
+
+        matched = self.df1['App ID'].isin(self.app_id_index)
+        self.merge_report = {
+            'matched': int(matched.sum()),
+            'left_orphans': int((~matched).sum()),
+            'right_orphans': int((~self.app_id_index.isin(self.df1['App ID'])).sum()),
+        }
+
+        merged_df = pd.merge(self.df1, right, left_on='App ID', right_index=True, how='outer')
+        return merged_df.reset_index(drop=True)
@@ -0,0 +1,143 @@
+from modules.DataCache import DataCache
+from modules.DataCleaner import DataCleaner
+from modules.DataIntegrator import DataIntegrator
+
+import multiprocessing
+import resource
+import sys
+import pandas as pd
+
+class DataLoader:
+    """
+    A class to read the two Steam csv files and clean them, either eagerly or chunk by chunk.
+
+    Attributes:
+        path1: Path of the first csv file (store pages, joined through 'url').
+        path2: Path of the second csv file (joined through 'App ID').
+        chunksize: Number of rows of the first csv file read and cleaned at a time.
+    """
+    # Columns parsed through the .str accessor, read as text even when a chunk has none of their values
+    TEXT_COLUMNS = ['all_reviews', 'original_price', 'Launch Price', 'Reviews Score Fancy', 'Revenue Estimated', 'Tags']
+
+    def __init__(self, path1, path2, chunksize=50000):
+        """
+        Initializes the DataLoader instance with the csv paths and the chunk size.
+
+        Args:
+            path1: Path of the first csv file.
+            path2: Path of the second csv file.
+            chunksize: Number of rows per chunk in the chunked mode.
+        """
+        self.path1 = path1
+        self.path2 = path2
+        self.chunksize = chunksize
+
+    def usecols(self, path, keep=()):
+        """
+        Lists the columns of a csv file which survive the cleaning, so the rest are never parsed.
+
+        Args:
+            path: Path of the csv file.
+            keep: Columns to read even though the cleaner drops them (e.g. join keys).
+
+        Returns:
+            A list of column names to read.
+        """
+        header = pd.read_csv(path, nrows=0).columns
+        return [col for col in header if col in keep or col not in DataCleaner.COLUMNS_TO_DROP]
+
+    def load_eager(self):
+        """
+        Reads both csv files fully and cleans them in one go, as done in the notebook.
+
+        Returns:
+            The cleaned dataframe.
+        """
+        df1 = pd.read_csv(self.path1)
+        df2 = pd.read_csv(self.path2)
+        return DataCleaner(df1, df2).clean_data()
+
+    def iter_clean_chunks(self):
+        """
+        Reads the first csv file in chunks and runs the row wise cleaning actions on each chunk
+        merged with its matching rows of the second file. Rows of the second file which never
+        matched are cleaned last, so the chunks add up to the same rows as the outer merge.
+
+        Yields:
+            Row wise cleaned dataframes, one per chunk.
+        """
+        usecols1 = self.usecols(self.path1)
+        usecols2 = self.usecols(self.path2, keep=['App ID'])
+        df2 = pd.read_csv(self.path2, usecols=usecols2, dtype=self.text_dtypes(usecols2))
+        right_ids = df2['App ID'].astype('Int64')
+        matched = pd.Series(False, index=df2.index)
+
+        for chunk in pd.read_csv(self.path1, usecols=usecols1, dtype=self.text_dtypes(usecols1), chunksize=self.chunksize):
+            chunk_ids = DataIntegrator(chunk, df2).extract_app_ids(chunk['url'])
+            in_chunk = right_ids.isin(chunk_ids)
+            matched |= in_chunk
+            yield DataCleaner(chunk, df2[in_chunk]).clean_rows()
+
+        if not matched.all():
+            empty = pd.DataFrame(columns=usecols1, dtype=object)
+            yield DataCleaner(empty, df2[~matched]).clean_rows()
+
+    def text_dtypes(self, columns):
+        """
+        Returns the read_csv dtypes of the TEXT_COLUMNS among columns. A chunk in which such a
+        column is empty would otherwise be read as float64.
+        """
+        return {col: object for col in self.TEXT_COLUMNS if col in columns}
+
+    def load_chunked(self):
+        """
+        Cleans the csv files chunk by chunk and applies the whole table actions at the end.
+        Peak memory is bounded by the second file, one chunk and the (narrow) cleaned rows.
+
+        Returns:
+            The cleaned dataframe.
+        """
+        df = pd.concat(self.iter_clean_chunks(), ignore_index=True)
+        return DataCleaner.from_merged(df).fill_review_score_reviews_total()
+
+    def load_cached(self, cache_dir='cache', chunked=False):
+        """
+        Loads the cleaned dataframe from the Parquet cache, cleaning the csv files only when
+        they or the cleaner changed since the cached copy was written.
+
+        Args:
+            cache_dir: Directory of the cache.
+            chunked: Whether a rebuild uses the chunked mode.
+
+        Returns:
+            The cleaned dataframe.
+        """
+        build = self.load_chunked if chunked else self.load_eager
+        return DataCache(cache_dir).load_or_build([self.path1, self.path2], build)
+
+    def peak_rss_report(self):
+        """
+        Measures the peak resident memory of the eager and the chunked mode, each in a fresh process.
+
+        Returns:
+            A dictionary with the peak RSS in MB and the number of cleaned rows of both modes.
+        """
+        context = multiprocessing.get_context('spawn')
+        report = {}
+        with context.Pool(1, maxtasksperchild=1) as pool:
+            for mode in ['eager', 'chunked']:
+                peak_mb, rows = pool.apply(_peak_rss, (self.path1, self.path2, self.chunksize, mode))
+                report[mode] = {'peak_rss_mb': peak_mb, 'rows': rows}
+        return report
+
+
+def _peak_rss(path1, path2, chunksize, mode):
+    """
+    Loads the data in the given mode and returns the peak RSS of the current process in MB.
+    """
+    loader = DataLoader(path1, path2, chunksize)
+    df = loader.load_eager() if mode == 'eager' else loader.load_chunked()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    peak_mb = peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+    return round(peak_mb, 1), len(df)
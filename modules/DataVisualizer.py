@@ -1,48 +1,258 @@
+import copy
+import io
+import threading
+import uuid
 import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
+import plotly.io as pio
 from plotly.subplots import make_subplots
 
 from dash import dcc, html
 from wordcloud import WordCloud
 import numpy as np
 
+from modules.AggregateCube import AggregateCube
+from modules.FigureCache import FigureCache
+from modules.TagMatrix import TagMatrix
+
 class DataVisualizer:
     """
     A class for visualizing data using Dash and Plotly.
 
     Attributes:
         df: The dataframe containing the data for visualization.
+        rows: Boolean mask of the games of df shown by a filtered view, None for all of them.
         selected_tags: A list of selected tags for filtering visualizations.
+        tag_matrix: Sparse game x tag matrix of the 'Tags' column.
+        genre_matrix: The tag matrix over normalized tag spellings.
+        cube: Aggregates by release year, tag and review summary.
+        genre_cube: Aggregates by release year, normalized tag and review summary.
+        figure_cache: Cache of the serialized figures.
+        version: Version stamp of the data and selected tags the figures are built from.
+        dirty: Whether the dataframe was changed in place since the cubes were built, see mark_dirty.
+        rendered_word_cloud: The version, WordCloud and PNG bytes of the last rendered word cloud.
     """
-
-    def __init__(self, df, selected_tags):
+    # Periods of the trends chart, including their start and excluding their end year
+    TREND_BINS = [2000, 2004, 2008, 2012, 2016, 2020, 2024]
+    TREND_LABELS = ['2000-2003', '2004-2007','2008-2011', '2012-2015', '2016-2019', '2020-2023']
+    # Periods of the revenue_by_genre pie charts, including both years
+    GENRE_PERIODS = [(2000, 2005), (2006, 2011), (2012, 2017), (2018, 2023)]
+    # Revenue thresholds of the scatter plot control, in USD
+    REVENUE_THRESHOLDS = [0, 1e5, 1e6, 5e6, 1e7, 5e7]
+    # Bubbles drawn with WebGL above this count, and never more than MAX_MARKERS bubbles
+    WEBGL_MARKERS = 1000
+    MAX_MARKERS = 5000
+    # URL prefix the word cloud image is served from (see DashBoard.register_callbacks)
+    IMAGE_ROUTE = '/_images/'
+    # Converted templates and subplot grids, shared by all instances
+    templates = {}
+    grids = {}
+
+    def __init__(self, df, selected_tags, tag_matrix=None, figure_cache=None, version=None):
         """
         Initializes the DataVisualizer instance with a dataframe and selected tags.
 
         Args:
             df: The dataframe containing the data for visualization.
             selected_tags: A list of selected tags for filtering visualizations.
+            tag_matrix: The TagMatrix built by DataCleaner, built from 'Tags' when not given or
+                when its rows are not the rows of df.
+            figure_cache: A FigureCache, possibly shared with other visualizers.
+            version: Version stamp of the data, a new random one when not given.
         """
-        self.df = df
-        self.df['Release Date'] = pd.to_datetime(self.df['Release Date'])
         self.selected_tags = selected_tags
         self.height = 800
+        self.figure_cache = figure_cache if figure_cache is not None else FigureCache()
+        self.rendered_word_cloud = None
+        self.refresh_lock = threading.Lock()
+        self.version = None
+        self.set_data(df, tag_matrix, version)
 
-    @property
-    def introduction(self):
+    def set_data(self, df, tag_matrix=None, version=None):
         """
-        Creates an introduction for the dashboard summarizing insights from each tab.
+        Replaces the visualized dataframe, rebuilding the tag matrices, the cubes and the version
+        stamp, which invalidates the cached figures of the previous data.
+
+        Args:
+            df: The dataframe containing the data for visualization.
+            tag_matrix: The TagMatrix built by DataCleaner, built from 'Tags' when not given or
+                when its rows are not the rows of df.
+            version: Version stamp of the data, a new random one when not given.
+        """
+        # the recipes of the cached figures would build the new data under the old keys
+        if self.version is not None:
+            self.figure_cache.forget()
+        self.df = df
+        self.rows = None
+        # DataCleaner already parses release dates to datetime64
+        if not pd.api.types.is_datetime64_any_dtype(self.df['Release Date']):
+            self.df['Release Date'] = pd.to_datetime(self.df['Release Date'])
+
+        # tags are split once here instead of exploding the frame on every render. A matrix of
+        # other rows, e.g. from before a reset_index, cannot be matched by label and is rebuilt
+        if tag_matrix is None or not tag_matrix.index.equals(self.df.index):
+            tag_matrix = TagMatrix.from_tags(self.df['Tags'])
+        self.tag_matrix = tag_matrix
+        self.genre_matrix = self.tag_matrix.normalized()
+
+        # the aggregated charts are served from these instead of grouping the frame per render
+        self.cube = AggregateCube(self.df, self.tag_matrix)
+        self.genre_cube = AggregateCube(self.df, self.genre_matrix)
+        # the stamp is never derived from the data, hashing a large frame takes too long
+        self.version = version if version is not None else uuid.uuid4().hex
+        self.dirty = False
+        return None
+
+    def view(self, rows, version, start=None, end=None, tags=None):
+        """
+        Creates a visualizer of the games matching a filter, sharing the dataframe, the tag
+        matrices and the figure cache. Its cubes are summed from the strata of the cubes of this
+        visualizer (see AggregateCube.filtered) and its other charts mask the dataframe with the
+        rows, so nothing is copied or grouped per game.
+
+        Args:
+            rows: Boolean mask of the matching games, as resolved by a FilterIndex.
+            version: Version stamp of the view, derived from the stamp of the data and the filter.
+            start: First release year of the filter, None for no lower bound.
+            end: Last release year of the filter, None for no upper bound.
+            tags: The tags of the filter; without them the rows are the games of the year range.
 
         Returns:
-            The intro for the dashboard as HTML content.
+            The DataVisualizer of the view.
+        """
+        view = copy.copy(self)
+        view.rows = rows
+        view.cube = self.cube.filtered(start, end, rows if tags else None)
+        view.genre_cube = self.genre_cube.filtered(start, end, rows if tags else None)
+        view.version = version
+        view.rendered_word_cloud = None
+        view.refresh_lock = threading.Lock()
+        return view
+
+    def mark_dirty(self):
+        """
+        Marks the dataframe as changed in place, for instance after its values or the selected
+        tags were edited. The tag matrices, the cubes and the version stamp are rebuilt before
+        the next figure is served, which invalidates the cached figures. Views are rebuilt from
+        the unfiltered visualizer, so only that one needs to be marked.
+        """
+        self.dirty = True
+        return None
+
+    def refresh(self):
+        """
+        Rebuilds the tag matrix, the cubes and the version stamp when the dataframe was marked
+        as changed by mark_dirty.
+
+        Returns:
+            True when the data was rebuilt.
+        """
+        if not self.dirty:
+            return False
+        with self.refresh_lock:
+            if not self.dirty:
+                return False
+            # the tag matrix given at construction may no longer match the tags
+            self.set_data(self.df)
+            return True
+
+    def template(self):
+        """
+        Returns the default Plotly template as a dictionary, for figures assembled without
+        graph objects. It is converted once per template name.
+        """
+        name = pio.templates.default
+        if name not in self.templates:
+            self.templates[name] = pio.templates[name].to_plotly_json()
+        return self.templates[name]
+
+    def cached_figure(self, chart, build, **params):
+        """
+        Makes sure a figure of the current data is in the figure cache, building it on a miss.
+
+        Args:
+            chart: Name of the chart.
+            build: Method building the Plotly figure, called with params.
+            params: Parameters of the chart.
+
+        Returns:
+            The key of the figure in the figure cache.
+        """
+        self.refresh()
+        return self.figure_cache.get_or_build(chart, build, self.version, **params)
+
+    def graph(self, chart, build, config=None, **params):
+        """
+        Creates a graph of a cached figure. The figure JSON is not part of the component: the
+        store holds its URL and the browser fetches it from the figure cache (see
+        DashBoard.register_callbacks).
+
+        Args:
+            chart: Name of the chart, unique among the graphs shown at once.
+            build: Method building the Plotly figure, called with params.
+            config: Optional dcc.Graph config.
+            params: Parameters of the chart.
+
+        Returns:
+            A Dash Div object containing the URL store and the graph.
+        """
+        url = self.figure_cache.url(self.cached_figure(chart, build, **params))
+        return html.Div([
+            dcc.Store(id={'type': 'figure-url', 'chart': chart}, data=url),
+            dcc.Graph(id={'type': 'cached-figure', 'chart': chart}, config=config or {}),
+        ])
+
+    def word_cloud(self):
+        """
+        Renders the word cloud of the game tags from the tag counts of the tag matrix, once per
+        version of the data.
+
+        Returns:
+            The rendered WordCloud.
+        """
+        if self.rendered_word_cloud is None or self.rendered_word_cloud[0] != self.version:
+            counts = self.tag_matrix.tag_counts(self.rows)
+            frequencies = counts[(counts > 0) & (counts.index != '')].to_dict()
+            wordcloud = WordCloud(width=800, height=400, background_color='white').generate_from_frequencies(frequencies)
+            self.rendered_word_cloud = (self.version, wordcloud, self.encode_image(wordcloud.to_image()))
+        return self.rendered_word_cloud[1]
+
+    def encode_image(self, image):
         """
+        Compresses an image to a 256 colour palette PNG, which keeps the flat coloured words of
+        the word cloud intact.
 
-        # creating word cloud to display in dashboard
-        categories_string = ','.join(self.df['Tags'])
-        wordcloud = WordCloud(width=800, height=400, background_color='white').generate(categories_string)
+        Returns:
+            The PNG bytes.
+        """
+        buffer = io.BytesIO()
+        image.quantize(256).save(buffer, format='PNG', optimize=True)
+        return buffer.getvalue()
+
+    def word_cloud_image(self):
+        """
+        Returns the word cloud as compressed PNG bytes, rendered once per version of the data.
+        """
+        self.word_cloud()
+        return self.rendered_word_cloud[2]
+
+    def word_cloud_url(self):
+        """
+        Returns the URL the dashboard serves the word cloud image of the current data from. It
+        names the version, so browsers can keep the image until the data changes.
+        """
+        self.refresh()
+        return f'{self.IMAGE_ROUTE}word_cloud-{self.version}.png'
+
+    def word_cloud_figure(self):
+        """
+        Creates the word cloud as a Plotly image figure, the way it was served before.
 
-        wc_array = np.array(wordcloud)
+        Returns:
+            The Plotly figure.
+        """
+        wc_array = np.array(self.word_cloud())
 
         fig = px.imshow(wc_array)
 
@@ -55,11 +265,33 @@ class DataVisualizer:
 
         fig.update_traces(hoverinfo='skip')
 
+        return fig
+
+    def word_cloud_payload_report(self):
+        """
+        Compares the payload of the word cloud as a Plotly image figure with the PNG image.
+
+        Returns:
+            A dictionary with the size in bytes of both payloads.
+        """
+        return {
+            'figure_json_bytes': len(pio.to_json(self.word_cloud_figure(), validate=False)),
+            'png_bytes': len(self.word_cloud_image()),
+        }
+
+    @property
+    def introduction(self):
+        """
+        Creates an introduction for the dashboard summarizing insights from each tab.
+
+        Returns:
+            The intro for the dashboard as HTML content.
+        """
         return html.Div([
             html.P("This dashboard offers a comprehensive analysis of Steam games across various dimensions, "
                     "including revenue, user reviews, and trends in game categories."),
             html.H2("Word cloud which shows the majority of game categories present in data", style={"marginTop": "20px"}),
-            dcc.Graph(figure=fig),
+            html.Img(src=self.word_cloud_url(), style={"display": "block", "maxWidth": "100%", "margin": "auto"}),
             html.H2("Dashboard Tabs:", style={"marginTop": "20px"}),
             html.Ul([
                 html.Li(["Pie Chart Representing Percentage of Game Reviews:", 
@@ -119,67 +351,70 @@ class DataVisualizer:
             html.P("Use the tabs above to navigate through these insights and explore the data in detail. We hope you enjoy the Dashboard!"),
         ])
 
-    @property
-    def trends_game_tags(self):
+    def trends_game_tags_figure(self, tags=None, bins=None, labels=None):
         """
         Creates a line plot showing trends of weighted average review scores for selected tags over time.
 
-        Returns:
-            A Dash Graph object displaying the trends.
-        """
-        self.df['weighted_review_score'] = self.df['review_score'] * self.df['Reviews Total']
-        self.df['Time Period'] = pd.cut(self.df['Release Date'].dt.year,
-                                bins=[2000, 2004, 2008, 2012, 2016, 2020, 2024],
-                                labels=['2000-2003', '2004-2007','2008-2011', '2012-2015', '2016-2019', '2020-2023'],
-                                right=False)
-
-        df_exploded = self.df.assign(Tags=self.df['Tags'].str.split(',')).explode('Tags')
-        df_exploded['Tags'] = df_exploded['Tags'].str.strip()
-        filtered_tags = df_exploded[df_exploded['Tags'].isin(self.selected_tags)]
-
-        tag_time_scores = filtered_tags.groupby(['Time Period', 'Tags']).apply(
-            lambda x: pd.Series({
-                'Weighted Average Review Score': (x['weighted_review_score'].sum() / x['Reviews Total'].sum()),
-            })
-        ).unstack()
-
-        tag_time_scores.columns = tag_time_scores.columns.droplevel()
-
-        fig = go.Figure()
-        for tag in tag_time_scores.columns:
-            fig.add_trace(go.Scatter(
-                x=tag_time_scores.index,  
-                y=tag_time_scores[tag],
-                mode='lines+markers',
-                name=tag,
-                line=dict(width=2),
-                marker=dict(size=6)        
-            ))
+        The scores come from the cube and the figure is assembled as a plain dictionary, so
+        rendering neither touches the dataframe nor pays for Plotly's per property validation.
 
-        fig.update_layout(
-            title='Weighted Average <b>Review Scores</b> of <b>Tags</b> Over Years:',
-            xaxis_title='Time Period',
-            height=self.height,
-            yaxis_title='Weighted Average Review Score',
-            legend_title='Tags',
-            xaxis=dict(tickmode='array', tickvals=tag_time_scores.index, ticktext=tag_time_scores.index),
-            yaxis=dict(showgrid=True),
-            margin=dict(r=200),
-            hovermode='closest'
-        )
+        Args:
+            tags: The tags to plot, the selected tags when not given.
+            bins: Ascending period edges in years, TREND_BINS when not given.
+            labels: Period labels, derived from the bins when not given.
 
-        return dcc.Graph(figure=fig)
+        Returns:
+            The Plotly figure as a dictionary.
+        """
+        if bins is None:
+            bins, labels = self.TREND_BINS, self.TREND_LABELS
+        tag_time_scores = self.cube.tag_trends(self.selected_tags if tags is None else tags, bins, labels)
+        periods = list(tag_time_scores.index)
+
+        data = [
+            {
+                'type': 'scatter',
+                'x': periods,
+                'y': tag_time_scores[tag].values,
+                'mode': 'lines+markers',
+                'name': tag,
+                'line': {'width': 2},
+                'marker': {'size': 6},
+            }
+            for tag in tag_time_scores.columns
+        ]
+        layout = {
+            'title': {'text': 'Weighted Average <b>Review Scores</b> of <b>Tags</b> Over Years:'},
+            'xaxis': {'title': {'text': 'Time Period'}, 'tickmode': 'array', 'tickvals': periods, 'ticktext': periods},
+            'height': self.height,
+            'yaxis': {'title': {'text': 'Weighted Average Review Score'}, 'showgrid': True},
+            'legend': {'title': {'text': 'Tags'}},
+            'margin': {'r': 200},
+            'hovermode': 'closest',
+            'template': self.template(),
+        }
+        return {'data': data, 'layout': layout}
 
     @property
-    def percentage_of_game_summary(self):
+    def trends_game_tags(self):
+        """
+        Creates a line plot showing trends of weighted average review scores for selected tags over time.
+
+        Returns:
+            A Dash Div object containing the graph of the trends.
+        """
+        return self.graph('trends_game_tags', self.trends_game_tags_figure)
+
+    def percentage_of_game_summary_figure(self):
         """
         Creates a pie chart showing the percentage of overall game outcomes.
 
         Returns:
-            A Dash Graph object displaying the pie chart.
+            The Plotly figure.
         """
-        fig = go.Figure(data=go.Pie(values=self.df['review_summary'].value_counts().values,
-                                    labels=self.df['review_summary'].value_counts().index,
+        summary_counts = self.cube.summary_totals('games').astype(int).sort_values(ascending=False)
+        fig = go.Figure(data=go.Pie(values=summary_counts.values,
+                                    labels=summary_counts.index,
                                     hole=0.3))
 
         fig.update_layout(title='Percentage of Overall <b>Game Outcome</b>:',
@@ -187,84 +422,99 @@ class DataVisualizer:
                           legend_title='Review Summary',
                           hovermode='closest')
 
-        return dcc.Graph(figure=fig)
-    
+        return fig
+
     @property
-    def revenue_by_genre(self):
+    def percentage_of_game_summary(self):
+        """
+        Creates a pie chart showing the percentage of overall game outcomes.
+
+        Returns:
+            A Dash Div object containing the graph of the pie chart.
+        """
+        return self.graph('percentage_of_game_summary', self.percentage_of_game_summary_figure)
+
+    def revenue_by_genre_grid(self):
+        """
+        Lays out the subplot grid of revenue_by_genre once. The grid does not depend on the data,
+        so the figure is filled in as a dictionary instead of going through make_subplots and
+        Plotly's validation on every render.
+
+        Returns:
+            A tuple of the trace dictionaries placed on the grid cells and the layout dictionary.
+        """
+        if 'revenue_by_genre' not in self.grids:
+            fig = make_subplots(
+                rows=3, cols=2,
+                specs=[
+                    [{'colspan': 2}, None],
+                    [{'type': 'domain'}, {'type': 'domain'}],
+                    [{'type': 'domain'}, {'type': 'domain'}] 
+                ],
+                subplot_titles=[
+                    "Top Categories by Revenue (Bar Chart)"
+                ] + [f"{start}-{end}" for start, end in self.GENRE_PERIODS]
+            )
+            fig.add_trace(go.Bar(), row=1, col=1)
+            for i in range(len(self.GENRE_PERIODS)):
+                fig.add_trace(go.Pie(), row=(i // 2) + 2, col=(i % 2) + 1)
+            grid = fig.to_plotly_json()
+            self.grids['revenue_by_genre'] = (grid['data'], grid['layout'])
+        return self.grids['revenue_by_genre']
+
+    def revenue_by_genre_figure(self):
         """
         Creates a combined layout showing:
         1. A bar chart for revenue collected by the top game categories.
         2. A grid of pie charts for revenue distribution across genres over time.
 
         Returns:
-            A Dash HTML Div containing a single dcc.Graph with both visualizations.
-        """
-        def normalize_tag(tag):
-            tag = tag.strip().lower()
-            tag = tag.replace('co-op', 'co op')
-            tag = tag.replace('first-person', 'first person')
-            return tag
-
-        copy_df = self.df.copy()
-        copy_df['Release Year'] = copy_df['Release Date'].dt.year
-        time_periods = [(2000, 2005), (2006, 2011), (2012, 2017), (2018, 2023)]
-
-        fig = make_subplots(
-            rows=3, cols=2,
-            specs=[
-                [{'colspan': 2}, None],
-                [{'type': 'domain'}, {'type': 'domain'}],
-                [{'type': 'domain'}, {'type': 'domain'}] 
-            ],
-            subplot_titles=[
-                "Top Categories by Revenue (Bar Chart)"
-            ] + [f"{start}-{end}" for start, end in time_periods]
-        )
+            The Plotly figure as a dictionary.
+        """
+        cells, grid_layout = self.revenue_by_genre_grid()
+
+        # every aggregate comes from one grouped reduction of the cube over the periods
+        bins = [start for start, _ in self.GENRE_PERIODS] + [self.GENRE_PERIODS[-1][1] + 1]
+        sums = self.genre_cube.period_cube(bins)
+        revenue = sums[:, :, self.genre_cube.MEASURES.index('revenue')]
+        games = sums[:, :, self.genre_cube.MEASURES.index('games')]
+        genres = self.genre_cube.vocabulary
 
         # getting data for the bar chart
-        tag_revenue = self.df['Tags'].str.split(',').explode().reset_index()
-        tag_revenue['Tags'] = tag_revenue['Tags'].apply(normalize_tag)
-        tag_revenue['Revenue'] = self.df.loc[tag_revenue['index'], 'Revenue Estimated'].values
-        tag_revenue = tag_revenue.groupby('Tags')['Revenue'].sum().reset_index()
+        tag_revenue = pd.Series(revenue.sum(axis=0), index=genres).sort_index().reset_index()
         tag_revenue.columns = ['Genre', 'Revenue']
         tag_revenue = tag_revenue.sort_values(by='Revenue', ascending=False)
 
-        fig.add_trace(
-            go.Bar(
-                x=tag_revenue['Genre'].head(20),
-                y=tag_revenue['Revenue'].head(20),
-                showlegend=False
-            ),
-            row=1, col=1
-        )
+        data = [dict(
+            cells[0],
+            x=tag_revenue['Genre'].head(20).to_numpy(),
+            y=tag_revenue['Revenue'].head(20).to_numpy(),
+            showlegend=False
+        )]
+        annotations = list(grid_layout['annotations'])
 
         # getting pie charts data 
-        for i, (start, end) in enumerate(time_periods):
-            period_df = copy_df[(copy_df['Release Year'] >= start) & (copy_df['Release Year'] <= end)]
-            tag_revenue = period_df['Tags'].str.split(',').explode().reset_index()
-            tag_revenue['Tags'] = tag_revenue['Tags'].apply(normalize_tag)
-            tag_revenue['Revenue'] = period_df.loc[tag_revenue['index'], 'Revenue Estimated'].values
-
-            tag_revenue = tag_revenue.groupby('Tags')['Revenue'].sum().reset_index()
+        for i, (start, end) in enumerate(self.GENRE_PERIODS):
+            # only tags which occur in the period, as a groupby over its rows would give
+            occurs = games[i] > 0
+            tag_revenue = pd.Series(revenue[i][occurs], index=genres[occurs]).sort_index().reset_index()
             tag_revenue.columns = ['Tags', 'Revenue']
             top_10_tags = tag_revenue.sort_values(by='Revenue', ascending=False).head(10)
             total_revenue = tag_revenue['Revenue'].sum()
 
+            data.append(dict(
+                cells[i + 1],
+                labels=top_10_tags['Tags'].to_numpy(),
+                values=top_10_tags['Revenue'].to_numpy(),
+                name=f"{start}-{end}",
+                showlegend=True
+            ))
+
             row = (i // 2) + 2
             col = (i % 2) + 1
-            fig.add_trace(
-                go.Pie(
-                    labels=top_10_tags['Tags'],
-                    values=top_10_tags['Revenue'],
-                    name=f"{start}-{end}",
-                    showlegend=True
-                ),
-                row=row, col=col
-            )
-
             x_pos = (col - 1) * 0.5 + 0.15
             y_pos = 1 - row * 0.34
-            fig.add_annotation(
+            annotations.append(dict(
                 x=x_pos,
                 y=y_pos,
                 text=f"Total Revenue: ${total_revenue:,.2f}",
@@ -272,10 +522,12 @@ class DataVisualizer:
                 xref="paper",
                 yref="paper",
                 font=dict(size=12, color="black")
-            )
+            ))
 
-        fig.update_layout(
-            title="Revenue Analysis of Top Game <b>Tags</b> over time",
+        layout = dict(
+            grid_layout,
+            annotations=annotations,
+            title=dict(text="Revenue Analysis of Top Game <b>Tags</b> over time"),
             height=1500,
             legend=dict(
                 x=1,
@@ -287,94 +539,222 @@ class DataVisualizer:
             showlegend=True
         )
 
-        return dcc.Graph(figure=fig, config={"responsive": True})
+        return dict(data=data, layout=layout)
 
     @property
-    def reviews_vs_revenue_over_time(self):
+    def revenue_by_genre(self):
         """
-        Creates a scatter plot showing games with revenue over 5 million USD and their reviews over time.
+        Creates a combined layout showing:
+        1. A bar chart for revenue collected by the top game categories.
+        2. A grid of pie charts for revenue distribution across genres over time.
 
         Returns:
-            A Dash Graph object displaying the scatter plot.
+            A Dash HTML Div containing a single graph with both visualizations.
         """
-        copy_df = self.df.copy()
-        copy_df['Release Year'] = copy_df['Release Date'].dt.year
-        copy_df.dropna(inplace=True)
-        copy_df = copy_df[copy_df['Revenue Estimated'] >= 5e6]
+        return self.graph('revenue_by_genre', self.revenue_by_genre_figure, config={"responsive": True})
+
+    def reviews_vs_revenue_over_time_figure(self, threshold=5e6, max_markers=None):
+        """
+        Creates a scatter plot showing games with revenue over a threshold and their reviews over time.
+
+        Above WEBGL_MARKERS games the bubbles are drawn with WebGL. Above max_markers games only
+        the max_markers games with the highest revenue are drawn as bubbles, over a heatmap of the
+        number of selected games per release year and review score, so the browser never receives
+        more than max_markers markers whatever the threshold.
+
+        Args:
+            threshold: Minimum estimated revenue in USD.
+            max_markers: Maximum number of bubbles, MAX_MARKERS when not given.
+
+        Returns:
+            The Plotly figure.
+        """
+        if max_markers is None:
+            max_markers = self.MAX_MARKERS
+
+        # rows with a missing value are left out, as dropna on a copy of the whole frame did
+        complete = self.df.notna().all(axis=1) & (self.df['Revenue Estimated'] >= threshold)
+        if self.rows is not None:
+            complete &= self.rows
+        copy_df = self.df.loc[complete, ['name', 'Release Date', 'Revenue Estimated', 'review_score', 'review_summary']]
+        copy_df.insert(1, 'Release Year', copy_df.pop('Release Date').dt.year)
+
+        title = f"Games which have collected Revenue over <b>{self.format_usd(threshold)}</b> over the years along with their <b>reviews</b>:"
+        markers = copy_df
+        if len(copy_df) > max_markers:
+            # the largest bubbles are kept, so the size scale matches the full selection
+            markers = copy_df.nlargest(max_markers, 'Revenue Estimated', keep='first').sort_index()
+            title += f"<br><sup>the {max_markers:,} highest earning of {len(copy_df):,} games, all of them counted in the background</sup>"
 
         fig = px.scatter(
-            copy_df, 
+            markers, 
             x="Release Year", 
             y="review_score", 
             size="Revenue Estimated",
             color='review_summary', 
             hover_name="name",
-            title="Games which have collected Revenue over <b>5 Million USD</b> over the years along with their <b>reviews</b>:",
-            labels={"review_score": "Review Score", "Revenue Estimated": "Estimated Revenue"}
+            title=title,
+            labels={"review_score": "Review Score", "Revenue Estimated": "Estimated Revenue"},
+            render_mode='webgl' if len(markers) > self.WEBGL_MARKERS else 'svg'
         )
 
         fig.update_traces(marker=dict(opacity=0.7, line=dict(width=1, color='DarkSlateGrey')))
         fig.update_layout(height=self.height, legend_title='Review Summary')
 
-        return dcc.Graph(figure=fig)
+        if len(markers) < len(copy_df):
+            fig.add_trace(self.density_heatmap(copy_df['Release Year'], copy_df['review_score']))
+            # drawn first, below the bubbles
+            fig.data = fig.data[-1:] + fig.data[:-1]
+
+        return fig
+
+    def density_heatmap(self, years, scores, score_step=2):
+        """
+        Counts games per release year and review score bin on the server.
+
+        Args:
+            years: Release years of the games.
+            scores: Review scores of the games, from 0 to 100.
+            score_step: Width of the review score bins.
+
+        Returns:
+            A Heatmap trace of the counts, with empty bins left transparent.
+        """
+        year_edges = np.arange(years.min(), years.max() + 2) - 0.5
+        score_edges = np.arange(0, 100 + score_step, score_step)
+        counts, _, _ = np.histogram2d(years, scores.clip(0, 100), bins=[year_edges, score_edges])
+        counts = counts.T
+        return go.Heatmap(
+            x=year_edges[:-1] + 0.5,
+            y=score_edges[:-1] + score_step / 2,
+            z=np.where(counts > 0, counts, np.nan),
+            colorscale='Greys',
+            opacity=0.5,
+            showscale=False,
+            name='Games',
+            hovertemplate='Release Year: %{x}<br>Review Score: %{y}<br>Games: %{z}<extra></extra>'
+        )
+
+    def format_usd(self, amount):
+        """
+        Formats an amount of USD for chart titles, e.g. '5 Million USD'.
+        """
+        if amount >= 1e6:
+            return f'{amount / 1e6:g} Million USD'
+        return f'{amount:,.0f} USD'
 
     @property
-    def production_and_revenue_over_years(self):
+    def reviews_vs_revenue_over_time(self):
         """
-        Creates a dual-axis plot showing game production counts and revenue earned over the years.
+        Creates a scatter plot showing games with revenue over a threshold and their reviews over time,
+        with a control selecting the threshold (see DashBoard.register_callbacks).
 
         Returns:
-            A Dash Graph object displaying the dual-axis plot.
+            A Dash Div object containing the threshold control and the scatter plot.
         """
-        filtered_df = self.df.copy()
-        filtered_df['Release Year'] = filtered_df['Release Date'].dt.year
-        filtered_df = filtered_df[(filtered_df['Release Year'] >= 2000) & (filtered_df['Release Year'] <= 2023)]
+        default = self.REVENUE_THRESHOLDS.index(5e6)
+        return html.Div([
+            html.Label("Minimum estimated revenue:"),
+            dcc.Slider(
+                id='revenue-threshold',
+                min=0,
+                max=len(self.REVENUE_THRESHOLDS) - 1,
+                step=None,
+                marks={i: self.format_usd(amount) for i, amount in enumerate(self.REVENUE_THRESHOLDS)},
+                value=default
+            ),
+            self.graph(
+                'reviews_vs_revenue_over_time', self.reviews_vs_revenue_over_time_figure,
+                threshold=self.REVENUE_THRESHOLDS[default]
+            )
+        ])
+
+    def revenue_scatter_url(self, position):
+        """
+        Returns the URL of the cached scatter plot of the threshold at a position of REVENUE_THRESHOLDS.
+        """
+        return self.figure_cache.url(self.cached_figure(
+            'reviews_vs_revenue_over_time', self.reviews_vs_revenue_over_time_figure,
+            threshold=self.REVENUE_THRESHOLDS[position]
+        ))
 
-        production_count = filtered_df.groupby('Release Year').size().reset_index(name='Game Count')
-        yearly_revenue = filtered_df.groupby('Release Year')['Revenue Estimated'].sum().reset_index()
+    def production_and_revenue_grid(self):
+        """
+        Lays out the dual-axis grid of production_and_revenue_over_years once, like
+        revenue_by_genre_grid, so the figure is filled in as a dictionary on every render.
 
-        fig = make_subplots(specs=[[{"secondary_y": True}]])
-        fig.add_trace(
-            go.Bar(
-                x=production_count['Release Year'],
-                y=production_count['Game Count'],
+        Returns:
+            A tuple of the trace dictionaries placed on both axes and the layout dictionary.
+        """
+        if 'production_and_revenue_over_years' not in self.grids:
+            fig = make_subplots(specs=[[{"secondary_y": True}]])
+            fig.add_trace(go.Bar(), secondary_y=False)
+            fig.add_trace(go.Scatter(), secondary_y=True)
+            fig.update_layout(template='plotly_white')
+            grid = fig.to_plotly_json()
+            self.grids['production_and_revenue_over_years'] = (grid['data'], grid['layout'])
+        return self.grids['production_and_revenue_over_years']
+
+    def production_and_revenue_over_years_figure(self):
+        """
+        Creates a dual-axis plot showing game production counts and revenue earned over the years.
+
+        Returns:
+            The Plotly figure as a dictionary.
+        """
+        production_count = self.cube.year_totals('games', 2000, 2023).astype(int)
+        yearly_revenue = self.cube.year_totals('revenue', 2000, 2023)
+        cells, grid_layout = self.production_and_revenue_grid()
+
+        data = [
+            dict(
+                cells[0],
+                x=production_count.index.to_numpy(),
+                y=production_count.to_numpy(),
                 name='Game Production',
-                marker_color='blue'
+                marker=dict(color='blue')
             ),
-            secondary_y=False,
-        )
-        fig.add_trace(
-            go.Scatter(
-                x=yearly_revenue['Release Year'],
-                y=yearly_revenue['Revenue Estimated'],
+            dict(
+                cells[1],
+                x=yearly_revenue.index.to_numpy(),
+                y=yearly_revenue.to_numpy(),
                 name='Revenue Earned',
                 mode='lines+markers',
                 line=dict(color='red', width=2)
             ),
-            secondary_y=True,
-        )
-        fig.update_layout(
-            title='Number of Games <b>Produced</b> and <b>Revenue</b> Over Years:',
-            xaxis_title='Release Year',
-            yaxis_title='Number of Games', 
-            yaxis2_title='Total Revenue (Estimated)',
-            legend_title='Metrics',
-            height=self.height,
-            template='plotly_white'
+        ]
+        layout = dict(
+            grid_layout,
+            title=dict(text='Number of Games <b>Produced</b> and <b>Revenue</b> Over Years:'),
+            xaxis=dict(grid_layout['xaxis'], title=dict(text='Release Year')),
+            yaxis=dict(grid_layout['yaxis'], title=dict(text='Number of Games')),
+            yaxis2=dict(grid_layout['yaxis2'], title=dict(text='Total Revenue (Estimated)')),
+            legend=dict(title=dict(text='Metrics')),
+            height=self.height
         )
 
-        return dcc.Graph(figure=fig)
+        return dict(data=data, layout=layout)
 
     @property
-    def top_games_comparison(self):
+    def production_and_revenue_over_years(self):
+        """
+        Creates a dual-axis plot showing game production counts and revenue earned over the years.
+
+        Returns:
+            A Dash Div object containing the graph of the dual-axis plot.
+        """
+        return self.graph('production_and_revenue_over_years', self.production_and_revenue_over_years_figure)
+
+    def top_games_comparison_figure(self):
         """
         Creates a bar chart comparing the top games by revenue and by reviews.
 
         Returns:
-            A Dash Graph object displaying the comparison.
+            The Plotly figure.
         """
-        revenue_top = self.df.nlargest(10, 'Revenue Estimated')[['name', 'Revenue Estimated']]
-        reviews_top = self.df.nlargest(10, 'Reviews Total')[['name', 'Reviews Total']]
+        games = self.df if self.rows is None else self.df.loc[self.rows, ['name', 'Revenue Estimated', 'Reviews Total']]
+        revenue_top = games.nlargest(10, 'Revenue Estimated')[['name', 'Revenue Estimated']]
+        reviews_top = games.nlargest(10, 'Reviews Total')[['name', 'Reviews Total']]
 
         fig = make_subplots(rows=1, cols=2, subplot_titles=("Top Games by Revenue", "Top Games by Reviews"))
         fig.add_trace(
@@ -390,4 +770,14 @@ class DataVisualizer:
             showlegend=False,
             height=self.height
         )
-        return dcc.Graph(figure=fig)  
\ No newline at end of file
+        return fig
+
+    @property
+    def top_games_comparison(self):
+        """
+        Creates a bar chart comparing the top games by revenue and by reviews.
+
+        Returns:
+            A Dash Div object containing the graph of the comparison.
+        """
+        return self.graph('top_games_comparison', self.top_games_comparison_figure)
@@ -0,0 +1,149 @@
+from collections import OrderedDict
+
+import hashlib
+import json
+import threading
+import plotly.io as pio
+
+class FigureCache:
+    """
+    A bounded LRU cache of serialized Plotly figures.
+
+    Entries are keyed by chart name, chart parameters and the version stamp of the data the
+    figure was built from, so a new dataframe never hits figures of the old one and the stale
+    entries age out of the cache. The figures are kept as JSON text only: the dashboard serves
+    that text as is from ROUTE (see DashBoard.register_callbacks), so a cache hit costs neither
+    a rebuild nor a new serialization. The way every figure was built is remembered beyond its
+    eviction, so a URL handed out before is served by rebuilding the figure until the data is
+    replaced (see forget). The cache is shared by concurrent Dash callbacks.
+
+    Attributes:
+        max_entries: Number of figures kept.
+        encoder: The FigureEncoder of the compact encoding mode, None for plain Plotly JSON.
+        max_recipes: Number of figure recipes kept.
+        entries: The chart name and figure JSON by key, least recently used first.
+        recipes: The chart name, build callable and parameters by key, least recently used first.
+        hits: Number of lookups served from the cache.
+        misses: Number of lookups which built the figure.
+    """
+    # URL prefix the figure JSON is served from
+    ROUTE = '/_figures/'
+
+    def __init__(self, max_entries=32, encoder=None, max_recipes=256):
+        """
+        Initializes the FigureCache instance.
+
+        Args:
+            max_entries: Number of figures kept.
+            encoder: A FigureEncoder serializing the figures in compact form, None for plain Plotly JSON.
+            max_recipes: Number of figure recipes kept, they hold on to the objects building the figures.
+        """
+        self.max_entries = max_entries
+        self.encoder = encoder
+        self.max_recipes = max_recipes
+        self.entries = OrderedDict()
+        self.recipes = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, chart, params, version):
+        """
+        Returns the cache key of a chart rendered with the given parameters from a data version.
+        The key determines the figure JSON, which makes it usable as an immutable URL.
+        """
+        payload = json.dumps([chart, params, version, self.encoder is not None], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+    def get_or_build(self, chart, build, version, **params):
+        """
+        Makes sure the figure is cached, building and serializing it on a miss.
+
+        Args:
+            chart: Name of the chart.
+            build: Callable returning the Plotly figure, called with params.
+            version: Version stamp of the data.
+            params: Parameters of the chart.
+
+        Returns:
+            The key of the cached figure.
+        """
+        key = self.key(chart, params, version)
+        with self.lock:
+            self.recipes[key] = (chart, build, params)
+            self.recipes.move_to_end(key)
+            while len(self.recipes) > self.max_recipes:
+                self.recipes.popitem(last=False)
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return key
+
+        self.build(key, chart, build, params)
+        return key
+
+    def build(self, key, chart, build, params):
+        """
+        Builds, serializes and caches the figure of a key.
+
+        Returns:
+            The chart name and figure JSON.
+        """
+        # built outside the lock, a concurrent miss of the same key only builds it twice
+        fig = build(**params)
+        text = self.encoder.to_json(fig) if self.encoder is not None else pio.to_json(fig, validate=False)
+
+        with self.lock:
+            self.misses += 1
+            self.entries[key] = (chart, text)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return chart, text
+
+    def get(self, key):
+        """
+        Returns the chart name and figure JSON of a key, rebuilding an evicted figure from its
+        recipe. None when the key is unknown or its data was replaced.
+        """
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+            recipe = self.recipes.get(key)
+        if recipe is None:
+            return None
+
+        chart, build, params = recipe
+        return self.build(key, chart, build, params)
+
+    def url(self, key):
+        """
+        Returns the URL the dashboard serves the figure JSON of a key from.
+        """
+        return f'{self.ROUTE}{key}.json'
+
+    def figure(self, key):
+        """
+        Returns the cached figure of a key as a dictionary, for use outside the dashboard.
+        """
+        entry = self.get(key)
+        return json.loads(entry[1]) if entry is not None else None
+
+    def forget(self):
+        """
+        Drops the recipes, for when the data the figures are built from is replaced or changed in
+        place: a recipe would then build the new data under the key of the old one. The cached
+        figures stay valid for their keys.
+        """
+        with self.lock:
+            self.recipes.clear()
+        return None
+
+    def clear(self):
+        """
+        Drops every cached figure.
+        """
+        with self.lock:
+            self.entries.clear()
+        return None
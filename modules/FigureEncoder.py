@@ -0,0 +1,156 @@
+import base64
+import numpy as np
+import plotly.io as pio
+
+class FigureEncoder:
+    """
+    Encodes Plotly figures into compact JSON for the dashboard.
+
+    The numeric data arrays of the traces are sent as base64 typed arrays in the smallest
+    dtype which keeps them at display precision: integers in the narrowest integer type up to
+    uint32, the widest plotly.js decodes, and other numbers as float32 unless that moves a value
+    by more than tolerance, as it does to revenues in the billions. Wider integers and those
+    other numbers are sent as float64. Trace attributes equal to their default value are
+    dropped, and so are the parts of the template which only apply to trace and subplot types
+    the figure does not use.
+
+    Attributes:
+        min_length: Shortest numeric list sent as a typed array, shorter ones stay JSON numbers.
+        tolerance: Largest change of a value allowed by the float32 cast.
+    """
+    # Data array attributes of the traces and of their markers
+    TRACE_ARRAYS = ['x', 'y', 'z', 'values', 'customdata']
+    MARKER_ARRAYS = ['size', 'color']
+    # Trace attributes whose value is the default of every trace type
+    TRACE_DEFAULTS = {'xaxis': 'x', 'yaxis': 'y', 'legendgroup': ''}
+    # Template layout entries which only style subplots of a kind, with the trace types drawn on them
+    SUBPLOT_TEMPLATES = {
+        'geo': ['scattergeo', 'choropleth'],
+        'polar': ['scatterpolar', 'scatterpolargl', 'barpolar'],
+        'scene': ['scatter3d', 'surface', 'mesh3d', 'cone', 'streamtube', 'volume', 'isosurface'],
+        'ternary': ['scatterternary'],
+    }
+    INTEGER_DTYPES = [np.int8, np.uint8, np.int16, np.uint16, np.int32, np.uint32]
+
+    def __init__(self, min_length=4, tolerance=0.005):
+        """
+        Initializes the FigureEncoder instance.
+
+        Args:
+            min_length: Shortest numeric list sent as a typed array.
+            tolerance: Largest change of a value allowed by the float32 cast, half a cent by default.
+        """
+        self.min_length = min_length
+        self.tolerance = tolerance
+
+    def to_json(self, fig):
+        """
+        Serializes a figure, a graph object or a dictionary, in compact form.
+
+        Returns:
+            The figure JSON.
+        """
+        figure = fig.to_plotly_json() if hasattr(fig, 'to_plotly_json') else fig
+        return pio.to_json(self.compact(figure), validate=False)
+
+    def compact(self, figure):
+        """
+        Returns a compact copy of a figure dictionary; the figure itself is not modified.
+        """
+        data = [self.compact_trace(trace) for trace in figure.get('data', [])]
+        layout = dict(figure.get('layout', {}))
+        if 'template' in layout:
+            layout['template'] = self.prune_template(layout['template'], data, layout)
+        return dict(figure, data=data, layout=layout)
+
+    def compact_trace(self, trace):
+        """
+        Returns a copy of a trace with typed data arrays and without default attributes.
+        """
+        trace = {
+            key: value for key, value in trace.items()
+            if not (key in self.TRACE_DEFAULTS and value == self.TRACE_DEFAULTS[key])
+        }
+        for key in self.TRACE_ARRAYS:
+            if key in trace:
+                trace[key] = self.typed_array(trace[key])
+        if isinstance(trace.get('marker'), dict):
+            marker = dict(trace['marker'])
+            for key in self.MARKER_ARRAYS:
+                if key in marker:
+                    marker[key] = self.typed_array(marker[key])
+            trace['marker'] = marker
+        return trace
+
+    def typed_array(self, values):
+        """
+        Encodes a numeric array as a base64 typed array of the smallest dtype at display precision.
+
+        Args:
+            values: A list, numpy array or typed array dictionary ({'dtype', 'bdata', 'shape'}).
+
+        Returns:
+            The typed array dictionary, or values unchanged when they are not numeric.
+        """
+        if isinstance(values, dict):
+            if 'bdata' not in values:
+                return values
+            array = np.frombuffer(base64.b64decode(values['bdata']), dtype=values['dtype'])
+            if 'shape' in values:
+                array = array.reshape([int(n) for n in str(values['shape']).split(',')])
+        elif isinstance(values, (list, tuple, np.ndarray)) and len(values) >= self.min_length:
+            try:
+                array = np.asarray(values)
+            except ValueError:
+                return values
+            if array.dtype.kind not in 'iuf':
+                return values
+        else:
+            return values
+
+        array = self.narrow(array)
+        encoded = {'dtype': array.dtype.str.lstrip('<|'), 'bdata': base64.b64encode(np.ascontiguousarray(array).tobytes()).decode()}
+        if array.ndim > 1:
+            encoded['shape'] = ','.join(map(str, array.shape))
+        return encoded
+
+    def narrow(self, array):
+        """
+        Casts a numeric array to the narrowest integer type holding its values when they are
+        all whole numbers, to float32 when that keeps every value within tolerance and to
+        float64 otherwise, since plotly.js has no 64 bit integer arrays.
+        """
+        finite = np.isfinite(array) if array.dtype.kind == 'f' else np.ones(array.shape, dtype=bool)
+        if finite.all() and array.size and np.array_equal(array, np.round(array)):
+            low, high = array.min(), array.max()
+            for dtype in self.INTEGER_DTYPES:
+                info = np.iinfo(dtype)
+                if info.min <= low and high <= info.max:
+                    return array.astype(dtype)
+        if array.dtype.kind in 'iu':
+            return array.astype(np.float64)
+        if array.dtype.itemsize <= 4:
+            return array
+        single = array.astype(np.float32)
+        # NaN and infinities survive the cast, only the finite values can move
+        if np.all(np.abs(single[finite] - array[finite]) <= self.tolerance):
+            return single
+        return array.astype(np.float64)
+
+    def prune_template(self, template, data, layout):
+        """
+        Keeps the template defaults of the trace types in data and of the subplot kinds the
+        layout or the traces use, dropping the others.
+        """
+        template = dict(template)
+        types = {trace.get('type', 'scatter') for trace in data}
+        if 'data' in template:
+            template['data'] = {key: value for key, value in template['data'].items() if key in types}
+        if 'layout' in template:
+            used = {key.rstrip('0123456789') for key in layout}
+            used.update(kind for kind, kind_types in self.SUBPLOT_TEMPLATES.items() if types.intersection(kind_types))
+            template['layout'] = {
+                key: value for key, value in template['layout'].items()
+                if key not in self.SUBPLOT_TEMPLATES or key in used
+            }
+        return template
@@ -0,0 +1,111 @@
+import numpy as np
+
+class FilterIndex:
+    """
+    An in-memory index answering release year and tag filters of the dashboard.
+
+    Every tag has a bitset with one bit per game, packed eight games to a byte, and the games
+    are sorted by release year once. A filter resolves to its rows by binary searching the year
+    range and combining the bitsets of the selected tags with bitwise operations, so the 'Tags'
+    strings are never scanned again.
+
+    Attributes:
+        index: The dataframe index the rows belong to.
+        vocabulary: The tags of the tag matrix the index was built from.
+        bitsets: Array of shape (tags, bytes) of the packed rows of every tag.
+        year_order: Row positions sorted by release year, games without one last.
+        sorted_years: The release years in year_order.
+    """
+
+    def __init__(self, df, tag_matrix):
+        """
+        Builds the index from the cleaned dataframe.
+
+        Args:
+            df: The cleaned dataframe, with its release dates parsed to datetime64.
+            tag_matrix: A TagMatrix aligned with the dataframe.
+        """
+        self.index = df.index
+        self.vocabulary = tag_matrix.vocabulary
+        n_rows = len(df)
+
+        # one pass over the nonzero entries sets the bit of every (tag, game) pair
+        incidence = tag_matrix.matrix.tocsc()
+        incidence.eliminate_zeros()
+        rows = incidence.indices.astype(np.int64)
+        tags = np.repeat(np.arange(incidence.shape[1]), np.diff(incidence.indptr))
+        bitsets = np.zeros((len(self.vocabulary), (n_rows + 7) // 8), dtype=np.uint8)
+        np.bitwise_or.at(bitsets.reshape(-1), tags * bitsets.shape[1] + (rows >> 3), (128 >> (rows & 7)).astype(np.uint8))
+        self.bitsets = bitsets
+
+        years = df['Release Date'].dt.year.to_numpy(dtype=float, na_value=np.nan)
+        self.year_order = np.argsort(years, kind='stable')
+        self.sorted_years = years[self.year_order]
+
+        # the index is only read once built, which makes its queries safe to run from several threads
+        self.bitsets.flags.writeable = False
+        self.year_order.flags.writeable = False
+        self.sorted_years.flags.writeable = False
+
+    def year_bounds(self):
+        """
+        Returns the first and last release year of the games, (None, None) when no game has one.
+        """
+        known = np.searchsorted(self.sorted_years, np.inf, side='right')
+        if known == 0:
+            return None, None
+        return int(self.sorted_years[0]), int(self.sorted_years[known - 1])
+
+    def year_bits(self, start=None, end=None):
+        """
+        Returns the packed rows of the games released in an inclusive year range. Games without
+        a release year are only included when neither bound is given.
+        """
+        n_rows = len(self.index)
+        if start is None and end is None:
+            return np.packbits(np.ones(n_rows, dtype=bool))
+        low = 0 if start is None else np.searchsorted(self.sorted_years, start, side='left')
+        # NaN sorts last, so an open upper bound stops at the first game without a year
+        high = np.searchsorted(self.sorted_years, np.inf if end is None else end, side='right')
+        selected = np.zeros(n_rows, dtype=bool)
+        selected[self.year_order[low:high]] = True
+        return np.packbits(selected)
+
+    def tag_bits(self, tags, match='any'):
+        """
+        Combines the bitsets of tags.
+
+        Args:
+            tags: The selected tags; tags not in the vocabulary match no game.
+            match: 'any' for games with at least one of the tags, 'all' for games with every tag.
+
+        Returns:
+            The packed rows of the matching games.
+        """
+        positions = self.vocabulary.get_indexer(list(tags))
+        known = positions[positions >= 0]
+        if match == 'any':
+            return np.bitwise_or.reduce(self.bitsets[known], axis=0) if len(known) else np.zeros(self.bitsets.shape[1], dtype=np.uint8)
+        if match == 'all':
+            if len(known) < len(positions) or not len(known):
+                return np.zeros(self.bitsets.shape[1], dtype=np.uint8)
+            return np.bitwise_and.reduce(self.bitsets[known], axis=0)
+        raise ValueError(f"match must be 'any' or 'all', got {match!r}")
+
+    def rows(self, start=None, end=None, tags=None, match='any'):
+        """
+        Resolves a filter to its rows.
+
+        Args:
+            start: First release year, None for no lower bound.
+            end: Last release year, None for no upper bound.
+            tags: The selected tags, None or empty for no tag filter.
+            match: How the tags combine, see tag_bits.
+
+        Returns:
+            A boolean mask over the rows of the dataframe.
+        """
+        bits = self.year_bits(start, end)
+        if tags:
+            bits &= self.tag_bits(tags, match)
+        return np.unpackbits(bits, count=len(self.index)).view(bool)
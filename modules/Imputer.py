@@ -1,5 +1,22 @@
+from optuna.storages import JournalStorage
+from optuna.storages.journal import JournalFileBackend
+from optuna.study import MaxTrialsCallback
+from optuna.trial import TrialState
+
+try:
+    from optuna_integration.xgboost import XGBoostPruningCallback
+except ImportError:
+    from optuna.integration import XGBoostPruningCallback
+
+import hashlib
+import json
+import multiprocessing
+import os
+import time
 import xgboost
 import optuna
+import numpy as np
+import pandas as pd
 
 class Imputer:
     """
@@ -8,18 +25,59 @@ class Imputer:
     Attributes:
         df: The dataframe containing the data for imputation.
         OPTUNA: A boolean indicating whether to use Optuna for hyperparameter optimization.
+        n_trials: Number of Optuna trials the study should reach.
+        n_jobs: Number of worker processes running trials, -1 for one per CPU core.
+        storage_path: Journal file persisting the study, None to keep it in memory.
+        model_dir: Directory of the persisted model artifact, None to retrain on every call.
     """
+    # The study is named after the metric its trials minimize, so that journals of studies
+    # scored differently (the accuracy maximizing study of earlier versions) are never resumed
+    STUDY_NAME = 'review_summary-merror'
+    MODEL_NAME = 'review_summary'
+    # Share of every label held out to score the trials, and the early stopping settings
+    VALIDATION_FRACTION = 0.2
+    MAX_ROUNDS = 500
+    EARLY_STOPPING_ROUNDS = 25
+    TREE_METHOD = 'hist'
+    FEATURES = ['Reviews Total', 'review_score', 'launch_price']
+    # Parameters used without Optuna
+    FIXED_PARAMS = {
+        'learning_rate': 0.2789690140794501,
+        'max_depth': 10,
+        'min_child_weight': 5,
+        'subsample': 0.7184437293302535,
+        'colsample_bytree': 0.6679592475294873,
+        'n_estimators': 412,
+        'lambda': 1.2641291472985302e-07,
+        'alpha': 0.07583611487593768,
+        'objective': 'multi:softmax',
+        'random_state': 42
+    }
 
-    def __init__(self, df, OPTUNA):
+    def __init__(self, df, OPTUNA, n_trials=100, n_jobs=1, storage_path=None, model_dir='models'):
         """
         Initializes the Imputer instance with a dataframe and Optuna flag.
 
         Args:
             df: The dataframe containing the data for imputation.
             OPTUNA: Boolean flag to determine if Optuna is used.
+            n_trials: Number of Optuna trials the study should reach.
+            n_jobs: Number of worker processes running trials, -1 for one per CPU core.
+            storage_path: Journal file persisting the study, None to keep it in memory.
+                A persisted study resumes where it stopped and is extended by raising n_trials.
+            model_dir: Directory of the persisted model artifact, None to retrain on every call.
         """
         self.df = df
         self.OPTUNA = OPTUNA
+        self.n_trials = n_trials
+        self.n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs
+        self.storage_path = storage_path
+        self.model_dir = model_dir
+        self.nthread = None
+        self.X_train = None
+        self.dtrain = None
+        self.model = None
+        self.throughput = None
         return None
 
     def objective(self, trial):
@@ -29,71 +87,219 @@ class Imputer:
         Args:
             trial: The Optuna trial object for suggesting hyperparameters.
 
+        Every trial boosts on the training split until the accuracy on the held-out split stops
+        improving, and is pruned early when its validation error falls behind the other trials.
+        The number of rounds reached is kept as the trial's 'n_estimators' attribute.
+
         Returns:
-            The training score of the XGBoost model.
+            The validation error rate of the XGBoost model.
         """
-        X_train, y_train, _ = self.get_x_and_y()
+        if self.dtrain is None:
+            self.get_x_and_y()
 
         param = {
             "objective": "multi:softmax",
             "num_class": len(self.label_mapping),
+            "tree_method": self.TREE_METHOD,
+            "eval_metric": "merror",
             "learning_rate": trial.suggest_float("learning_rate", 0.01, 0.3),
             "max_depth": trial.suggest_int("max_depth", 3, 10),
             "min_child_weight": trial.suggest_int("min_child_weight", 1, 10),
             "subsample": trial.suggest_float("subsample", 0.5, 1.0),
             "colsample_bytree": trial.suggest_float("colsample_bytree", 0.5, 1.0),
-            "n_estimators": trial.suggest_int("n_estimators", 50, 500),
             "lambda": trial.suggest_float("lambda", 1e-8, 10.0, log=True),
             "alpha": trial.suggest_float("alpha", 1e-8, 10.0, log=True),
-            "random_state": 42,
+            "seed": 42,
         }
+        if self.nthread:
+            param["nthread"] = self.nthread
 
-        model = xgboost.XGBClassifier(**param)
-        model.fit(X_train, y_train)
+        model = xgboost.train(
+            param,
+            self.dtrain_split,
+            num_boost_round=self.MAX_ROUNDS,
+            evals=[(self.dvalid, "validation")],
+            early_stopping_rounds=self.EARLY_STOPPING_ROUNDS,
+            callbacks=[XGBoostPruningCallback(trial, "validation-merror")],
+            verbose_eval=False,
+        )
+        trial.set_user_attr("n_estimators", model.best_iteration + 1)
 
-        score = model.score(X_train, y_train)
+        score = model.best_score
         return score
 
     def get_x_and_y(self):
         """
         Prepares training and testing datasets and maps review summaries to numerical labels.
+        The matrices are built once, as contiguous float32 arrays plus an XGBoost DMatrix of the
+        training rows, and shared by every Optuna trial and the final fit.
 
         Returns:
             A tuple containing:
                 - Features for training (X_train).
                 - Labels for training (y_train).
-                - Dataframe for testing (test_data).
+                - Features for testing (X_test).
         """
-        data = self.df.copy()
+        if self.dtrain is None:
+            X_train, y_train, _ = self.training_arrays()
+            self.load_training_data(X_train, y_train, self.labels)
+
+        return self.X_train, self.y_train, self.X_test
 
-        train_data = data[data['review_summary'] != '']
-        test_data = data[data['review_summary'] == '']
-        self.label_mapping = {category: idx for idx, category in enumerate(train_data["review_summary"].unique())}
+    def training_arrays(self):
+        """
+        Splits the dataframe into the float32 feature and label arrays, without building any
+        DMatrix, so that the artifact fingerprint stays cheap when the persisted model is reused.
+
+        Returns:
+            A tuple containing:
+                - Features for training (X_train).
+                - Labels for training (y_train).
+                - Features for testing (X_test).
+        """
+        if self.X_train is None:
+            summary = self.df['review_summary'].to_numpy(dtype=object)
+            train = summary != ''
+            labels, self.labels = pd.factorize(summary[train])
+            self.label_mapping = {category: idx for idx, category in enumerate(self.labels)}
 
-        train_data = train_data[['Reviews Total', 'review_score', 'launch_price', 'review_summary']]
-        test_data = test_data[['Reviews Total', 'review_score', 'launch_price', 'review_summary']]
+            features = np.ascontiguousarray(self.df[self.FEATURES].to_numpy(dtype=np.float32))
+            self.X_train = features[train]
+            self.y_train = labels.astype(np.float32)
+            self.X_test = features[~train]
 
-        train_data["review_summary"] = train_data["review_summary"].map(self.label_mapping)
+        return self.X_train, self.y_train, self.X_test
 
-        return (
-            train_data[['Reviews Total', 'review_score', 'launch_price']],
-            train_data['review_summary'].astype(int),
-            test_data,
+    def load_training_data(self, X_train, y_train, labels):
+        """
+        Sets the training matrices and builds the DMatrix of the final fit plus the training and
+        validation DMatrix shared by the trials. Worker processes receive the arrays through this
+        method instead of the whole dataframe.
+
+        Args:
+            X_train: Contiguous float32 training features.
+            y_train: Float32 label codes.
+            labels: The review summaries in label code order.
+        """
+        self.X_train = X_train
+        self.y_train = y_train
+        self.labels = labels
+        self.label_mapping = {category: idx for idx, category in enumerate(labels)}
+        self.dtrain = xgboost.DMatrix(
+            X_train, label=y_train, feature_names=self.FEATURES, nthread=self.nthread or -1
+        )
+
+        valid = self.validation_mask(y_train)
+        self.dtrain_split = xgboost.DMatrix(
+            X_train[~valid], label=y_train[~valid], feature_names=self.FEATURES, nthread=self.nthread or -1
         )
+        self.dvalid = xgboost.DMatrix(
+            X_train[valid], label=y_train[valid], feature_names=self.FEATURES, nthread=self.nthread or -1
+        )
+        return None
+
+    def validation_mask(self, y_train):
+        """
+        Draws a stratified held-out split: VALIDATION_FRACTION of the rows of every label, rounded
+        down, so that labels with a single game stay in the training split.
+
+        Args:
+            y_train: Float32 label codes.
+
+        Returns:
+            A boolean mask of the validation rows.
+        """
+        codes = y_train.astype(np.int64)
+        order = np.random.default_rng(42).permutation(len(codes))
+        rank = pd.Series(codes[order]).groupby(codes[order]).cumcount().to_numpy()
+        quota = np.floor(np.bincount(codes) * self.VALIDATION_FRACTION)
+
+        valid = np.zeros(len(codes), dtype=bool)
+        valid[order] = rank < quota[codes[order]]
+        return valid
+
+    def fit(self, params):
+        """
+        Trains a booster on the shared training DMatrix.
+
+        Args:
+            params: XGBoost parameters, with the number of trees as 'n_estimators'.
+
+        Returns:
+            The trained XGBoost booster.
+        """
+        params = dict(params)
+        num_boost_round = params.pop('n_estimators')
+        params['seed'] = params.pop('random_state', 0)
+        if self.nthread:
+            params['nthread'] = self.nthread
+        return xgboost.train(params, self.dtrain, num_boost_round=num_boost_round)
+
+    def load_study(self):
+        """
+        Creates the study, or loads it from the journal file when it was persisted before.
+
+        Returns:
+            The Optuna study.
+
+        Raises:
+            ValueError: When the persisted study does not minimize its objective.
+        """
+        storage = None
+        if self.storage_path is not None:
+            storage = JournalStorage(JournalFileBackend(self.storage_path))
+        study = optuna.create_study(
+            study_name=self.STUDY_NAME,
+            storage=storage,
+            direction="minimize",
+            pruner=optuna.pruners.MedianPruner(n_startup_trials=5, n_warmup_steps=10),
+            load_if_exists=True,
+        )
+        # load_if_exists keeps the direction the study was created with
+        if study.direction != optuna.study.StudyDirection.MINIMIZE:
+            raise ValueError(f"The persisted study '{self.STUDY_NAME}' does not minimize the validation error.")
+        return study
+
+    def finished_trials(self, study):
+        """
+        Counts the trials of a study which ran to the end. Trials left running by a crash are
+        not counted, so they are run again on resume.
+        """
+        return len(study.get_trials(deepcopy=False, states=(TrialState.COMPLETE, TrialState.PRUNED)))
 
     def optuna_trials(self):
         """
         Runs Optuna optimization to find the best hyperparameters for the XGBoost model.
 
+        With several jobs the trials run in worker processes sharing the journal file, each
+        XGBoost fit using an equal share of the CPU cores.
+
         Returns:
             A dictionary of the best hyperparameters found by Optuna.
         """
-        study = optuna.create_study(direction="maximize")
-        study.optimize(self.objective, n_trials=100)
+        X_train, y_train, _ = self.get_x_and_y()
+        study = self.load_study()
+        remaining = self.n_trials - self.finished_trials(study)
+
+        if remaining > 0 and self.n_jobs > 1:
+            if self.storage_path is None:
+                raise ValueError('Parallel tuning needs a storage_path shared by the worker processes.')
+            nthread = max(1, os.cpu_count() // self.n_jobs)
+            trials_per_job = -(-remaining // self.n_jobs)
+            context = multiprocessing.get_context('spawn')
+            with context.Pool(self.n_jobs) as pool:
+                pool.starmap(_run_trials, [
+                    (self.storage_path, X_train, y_train, self.labels, self.n_trials, trials_per_job, nthread)
+                ] * self.n_jobs)
+            study = self.load_study()
+        elif remaining > 0:
+            study.optimize(self.objective, n_trials=remaining)
 
         best_params = study.best_params
+        best_params["n_estimators"] = study.best_trial.user_attrs["n_estimators"]
         best_params["objective"] = "multi:softmax"
         best_params["num_class"] = len(self.label_mapping)
+        best_params["tree_method"] = self.TREE_METHOD
         best_params["random_state"] = 42
 
         return best_params
@@ -104,48 +310,180 @@ class Imputer:
 
         Returns: 
             A tuple containing:
-                - The trained XGBoost model.
-                - The test dataset for predictions.
+                - The trained XGBoost booster.
+                - The test features for predictions.
         """
+        X_train, y_train, X_test = self.get_x_and_y()
+
         if self.OPTUNA:
             best_params = self.optuna_trials()
         else:
-            best_params = {
-                'learning_rate': 0.2789690140794501,
-                'max_depth': 10,
-                'min_child_weight': 5,
-                'subsample': 0.7184437293302535,
-                'colsample_bytree': 0.6679592475294873,
-                'n_estimators': 412,
-                'lambda': 1.2641291472985302e-07,
-                'alpha': 0.07583611487593768,
-                'objective': 'multi:softmax',
-                'num_class': 9,
-                'random_state': 42
-            }
-
-        X_train, y_train, test_data = self.get_x_and_y()
-
-        model = xgboost.XGBClassifier(**best_params)
-        model.fit(X_train, y_train)
-
-        return model, test_data
+            best_params = dict(self.FIXED_PARAMS, num_class=len(self.label_mapping))
+
+        model = self.fit(best_params)
+        self.params = best_params
+
+        return model, X_test
+
+    def training_settings(self):
+        """
+        Returns the settings the model is trained with: the fixed parameters, or the study and
+        boosting settings of the Optuna search.
+        """
+        if not self.OPTUNA:
+            return {'params': self.FIXED_PARAMS}
+        return {
+            'study_name': self.STUDY_NAME,
+            'n_trials': self.n_trials,
+            'tree_method': self.TREE_METHOD,
+            'max_rounds': self.MAX_ROUNDS,
+            'early_stopping_rounds': self.EARLY_STOPPING_ROUNDS,
+            'validation_fraction': self.VALIDATION_FRACTION,
+        }
+
+    def fingerprint(self):
+        """
+        Hashes the training features, labels and label mapping together with the tuning mode and
+        the training settings.
+
+        Returns:
+            A hex digest identifying what a model trained on the current data would learn from.
+        """
+        X_train, y_train, _ = self.training_arrays()
+        metadata = [self.FEATURES, list(self.labels), bool(self.OPTUNA), self.training_settings()]
+        digest = hashlib.sha256(json.dumps(metadata, sort_keys=True).encode())
+        digest.update(X_train.tobytes())
+        digest.update(y_train.tobytes())
+        return digest.hexdigest()
+
+    def artifact_path(self, extension):
+        """
+        Returns the path of a file of the model artifact.
+        """
+        return os.path.join(self.model_dir, f'{self.MODEL_NAME}.{extension}')
+
+    def save_model(self, model):
+        """
+        Persists the booster next to a metadata file holding its label mapping, features,
+        parameters and the fingerprint of its training data.
+
+        Args:
+            model: The trained XGBoost booster.
+        """
+        os.makedirs(self.model_dir, exist_ok=True)
+        metadata = {
+            'fingerprint': self.fingerprint(),
+            'labels': list(self.labels),
+            'features': self.FEATURES,
+            'params': self.params,
+        }
+
+        # the metadata is replaced last, so that it never describes a half written booster
+        model.save_model(self.artifact_path('tmp.ubj'))
+        os.replace(self.artifact_path('tmp.ubj'), self.artifact_path('ubj'))
+        with open(self.artifact_path('json.tmp'), 'w') as file:
+            json.dump(metadata, file, indent=2)
+        os.replace(self.artifact_path('json.tmp'), self.artifact_path('json'))
+        return None
+
+    def load_model(self):
+        """
+        Loads the persisted booster when it was trained on the current data.
+
+        Returns:
+            The XGBoost booster, or None when there is no artifact or its fingerprint is stale.
+        """
+        if self.model_dir is None or not os.path.exists(self.artifact_path('json')):
+            return None
+
+        with open(self.artifact_path('json')) as file:
+            metadata = json.load(file)
+        if metadata['fingerprint'] != self.fingerprint() or metadata['features'] != self.FEATURES:
+            return None
+
+        model = xgboost.Booster()
+        model.load_model(self.artifact_path('ubj'))
+        self.params = metadata['params']
+        self.labels = np.array(metadata['labels'], dtype=object)
+        return model
+
+    def get_model(self):
+        """
+        Returns the preloaded booster. On first use the persisted one is loaded, or a new one is
+        trained (and persisted) when it is missing or stale.
+        """
+        if self.model is None:
+            self.model = self.load_model()
+            if self.model is None:
+                # Training the model
+                self.model, _ = self.train_model()
+                if self.model_dir is not None:
+                    self.save_model(self.model)
+        return self.model
+
+    def predict_chunks(self, chunks, batch_size=10000):
+        """
+        Imputes 'review_summary' in a stream of row chunks, for instance the cleaned chunks of
+        DataLoader.iter_clean_chunks. Unlabelled rows are predicted in fixed-size batches and the
+        labels are written back by position, so memory stays bounded by one chunk whatever the
+        length of the stream. The running throughput is kept in the throughput attribute.
+
+        Args:
+            chunks: Iterable of dataframes holding the feature columns and 'review_summary'.
+            batch_size: Number of rows predicted at once.
+
+        Yields:
+            The chunks with their empty 'review_summary' values imputed.
+        """
+        model = self.get_model()
+        self.throughput = {'rows': 0, 'seconds': 0.0, 'rows_per_second': float('nan')}
+
+        for chunk in chunks:
+            start = time.perf_counter()
+            column = chunk.columns.get_loc('review_summary')
+            positions = np.flatnonzero((chunk['review_summary'] == '').to_numpy())
+            features = chunk[self.FEATURES]
+
+            for begin in range(0, len(positions), batch_size):
+                batch = positions[begin:begin + batch_size]
+                X_batch = np.ascontiguousarray(features.iloc[batch].to_numpy(dtype=np.float32))
+                predictions = model.predict(xgboost.DMatrix(X_batch, feature_names=self.FEATURES))
+                chunk.iloc[batch, column] = self.labels[predictions.astype(np.intp)]
+
+            self.throughput['rows'] += len(positions)
+            self.throughput['seconds'] += time.perf_counter() - start
+            if self.throughput['seconds'] > 0:
+                self.throughput['rows_per_second'] = self.throughput['rows'] / self.throughput['seconds']
+            yield chunk
 
     def predict_data(self):
         """
-        Predicts missing values for the 'review_summary' column using the trained model.
+        Predicts missing values for the 'review_summary' column using the trained model. The
+        persisted model is reused while the training data is unchanged, otherwise a new one is
+        trained and persisted.
 
         Returns:
             The updated dataframe with imputed 'review_summary' values.
         """
-        # Training the model
-        model, test_data = self.train_model()
-
         # Predicting the values
-        predictions = model.predict(test_data[['Reviews Total', 'review_score', 'launch_price']])
+        self.df = next(self.predict_chunks([self.df]))
 
-        reverse_mapping = {v: k for k, v in self.label_mapping.items()}
-        test_data["review_summary"] = [reverse_mapping[p] for p in predictions]
-
-        self.df.loc[self.df["review_summary"] == "", "review_summary"] = test_data["review_summary"]
+        # a compact (categorical) review_summary would otherwise keep '' as an empty category
+        if isinstance(self.df["review_summary"].dtype, pd.CategoricalDtype):
+            self.df["review_summary"] = self.df["review_summary"].cat.remove_unused_categories()
         return self.df
+
+
+def _run_trials(storage_path, X_train, y_train, labels, n_trials, trials_per_job, nthread):
+    """
+    Runs trials of the persisted study in a worker process, stopping once the study reaches
+    n_trials finished trials.
+    """
+    imputer = Imputer(None, True, n_trials=n_trials, storage_path=storage_path)
+    imputer.nthread = nthread
+    imputer.load_training_data(X_train, y_train, labels)
+
+    study = imputer.load_study()
+    stop = MaxTrialsCallback(n_trials, states=(TrialState.COMPLETE, TrialState.PRUNED))
+    study.optimize(imputer.objective, n_trials=trials_per_job, callbacks=[stop])
+    return None
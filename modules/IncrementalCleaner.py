@@ -0,0 +1,238 @@
+from modules.DataCleaner import DataCleaner
+from modules.DataIntegrator import DataIntegrator
+
+import json
+import os
+import pandas as pd
+
+class IncrementalCleaner:
+    """
+    A class to clean daily appended scrapes incrementally into a persisted store.
+
+    Every merged row is keyed by its App ID (its url, or a hash of the row, when it has none) and
+    fingerprinted by the source columns the cleaner reads. Only new or changed rows go through the
+    row wise cleaning actions and are upserted into the store, and stored rows whose key is no
+    longer in the scrape are removed. A row without App ID and url is identified by its content,
+    so when it changes, its old version leaves the store as a removed row and the new one comes
+    in as a new row. The median and mean fills of
+    fill_review_score_reviews_total are answered from sufficient statistics kept next to the store:
+    a histogram of 'Reviews Total' and the sum and count of 'review_score'.
+
+    Every save writes the rows, the seen keys and the statistics as a new generation of files
+    and then switches manifest.json to it, so the three always belong to the same update.
+
+    Attributes:
+        store_dir: Directory of the persisted store.
+    """
+    KEY = '_key'
+    FINGERPRINT = '_fingerprint'
+
+    def __init__(self, store_dir='store'):
+        """
+        Initializes the IncrementalCleaner instance with a store directory.
+
+        Args:
+            store_dir: Directory of the persisted store.
+        """
+        self.store_dir = store_dir
+
+    def path(self, name):
+        """
+        Returns the path of a file of the store.
+        """
+        return os.path.join(self.store_dir, name)
+
+    def generation_files(self, generation):
+        """
+        Returns the names of the rows, seen and stats files of a generation of the store.
+        """
+        return f'rows.{generation}.parquet', f'seen.{generation}.parquet', f'stats.{generation}.json'
+
+    def generation(self):
+        """
+        Returns the generation recorded in the manifest, None when nothing was stored yet.
+        """
+        if not os.path.exists(self.path('manifest.json')):
+            return None
+        with open(self.path('manifest.json')) as file:
+            return json.load(file)['generation']
+
+    def load(self):
+        """
+        Loads the generation of the store the manifest points to, or an empty store when
+        nothing was stored yet.
+
+        Returns:
+            A tuple containing:
+                - The row wise cleaned rows.
+                - The key and fingerprint of every row seen, including rows the cleaning dropped.
+                - The sufficient statistics.
+        """
+        generation = self.generation()
+        if generation is None:
+            seen = pd.DataFrame({self.KEY: pd.Series(dtype=object), self.FINGERPRINT: pd.Series(dtype='uint64')})
+            return None, seen, {'reviews_total_counts': {}, 'score_sum': 0.0, 'score_count': 0}
+
+        rows_file, seen_file, stats_file = self.generation_files(generation)
+        with open(self.path(stats_file)) as file:
+            stats = json.load(file)
+        stats['reviews_total_counts'] = {float(value): count for value, count in stats['reviews_total_counts']}
+        return pd.read_parquet(self.path(rows_file)), pd.read_parquet(self.path(seen_file)), stats
+
+    def save(self, rows, seen, stats):
+        """
+        Persists the store as a new generation. The files of the generation are written first
+        and the manifest pointing to it last, replacing the old one atomically, so a crash
+        at any point leaves the previous generation in place as a whole.
+        """
+        os.makedirs(self.store_dir, exist_ok=True)
+        previous = self.generation()
+        generation = 0 if previous is None else previous + 1
+        rows_file, seen_file, stats_file = self.generation_files(generation)
+
+        rows.to_parquet(self.path(rows_file))
+        seen.to_parquet(self.path(seen_file))
+        stats = dict(stats, reviews_total_counts=[[value, count] for value, count in stats['reviews_total_counts'].items()])
+        with open(self.path(stats_file), 'w') as file:
+            json.dump(stats, file)
+
+        with open(self.path('manifest.json') + '.tmp', 'w') as file:
+            json.dump({'generation': generation}, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(self.path('manifest.json') + '.tmp', self.path('manifest.json'))
+
+        # files of older generations, including ones left by an interrupted save, are no longer read
+        current = set(self.generation_files(generation)) | {'manifest.json'}
+        for name in os.listdir(self.store_dir):
+            parts = name.split('.')
+            if name not in current and len(parts) == 3 and parts[0] in ('rows', 'seen', 'stats') and parts[1].isdigit():
+                os.remove(self.path(name))
+        return None
+
+    def key_rows(self, merged):
+        """
+        Adds the key and fingerprint columns to the merged rows.
+
+        Args:
+            merged: The merged dataframe.
+
+        Returns:
+            The merged dataframe with the key and fingerprint columns.
+        """
+        source = [col for col in DataCleaner.plan() if col in merged.columns]
+        fingerprint = pd.util.hash_pandas_object(merged[source], index=False)
+
+        key = ('row:' + fingerprint.astype(str)).where(merged['url'].isna(), 'url:' + merged['url'].astype(str))
+        key = key.where(merged['App ID'].isna(), 'app:' + merged['App ID'].astype(str))
+        # repeated App IDs / urls are told apart by their order of appearance
+        key = key + '#' + key.groupby(key).cumcount().astype(str)
+
+        return merged.assign(**{self.KEY: key.values, self.FINGERPRINT: fingerprint.values})
+
+    def contribution(self, rows):
+        """
+        Computes what a set of row wise cleaned rows adds to the sufficient statistics.
+
+        Args:
+            rows: Row wise cleaned rows.
+
+        Returns:
+            A tuple of the 'Reviews Total' value counts, the 'review_score' sum and its count.
+        """
+        kept = rows[(rows['Reviews Total'] != 0) & (rows['review_score'] != 0)]
+        counts = kept['Reviews Total'].value_counts()
+        return counts, kept['review_score'].sum(), int(kept['review_score'].count())
+
+    def update_stats(self, stats, rows, sign):
+        """
+        Adds (sign 1) or removes (sign -1) the contribution of rows to the sufficient statistics.
+        """
+        counts, score_sum, score_count = self.contribution(rows)
+        histogram = stats['reviews_total_counts']
+        for value, count in counts.items():
+            histogram[float(value)] = histogram.get(float(value), 0) + sign * int(count)
+            if histogram[float(value)] == 0:
+                del histogram[float(value)]
+        stats['score_sum'] += sign * float(score_sum)
+        stats['score_count'] += sign * score_count
+        return stats
+
+    def median(self, histogram):
+        """
+        Returns the median of the values counted in a histogram, NaN when it is empty.
+        """
+        counts = pd.Series(histogram, dtype='int64').sort_index()
+        total = counts.sum()
+        if total == 0:
+            return float('nan')
+        cumulative = counts.cumsum().values
+        lower = counts.index[(cumulative >= (total + 1) // 2).argmax()]
+        upper = counts.index[(cumulative >= total // 2 + 1).argmax()]
+        return (lower + upper) / 2
+
+    def update(self, df1, df2):
+        """
+        Cleans the new and changed rows of the raw dataframes and upserts them into the store.
+
+        Args:
+            df1: The first raw dataframe (full scrape including the appended rows).
+            df2: The second raw dataframe.
+
+        Returns:
+            A dictionary with the number of new, changed, unchanged and removed rows.
+        """
+        merged = self.key_rows(DataIntegrator(df1, df2).merge_dataframes())
+        rows, seen, stats = self.load()
+
+        position = pd.Index(seen[self.KEY]).get_indexer(merged[self.KEY])
+        is_new = position < 0
+        is_changed = ~is_new
+        is_changed[~is_new] = seen[self.FINGERPRINT].values[position[~is_new]] != merged[self.FINGERPRINT].values[~is_new]
+        delta = merged[is_new | is_changed]
+        # the scrape is complete, so a key missing from it is a row which is gone (or changed, for keyless rows)
+        removed = seen[self.KEY][~seen[self.KEY].isin(merged[self.KEY])]
+        summary = {
+            'new': int(is_new.sum()), 'changed': int(is_changed.sum()),
+            'unchanged': int(len(merged) - len(delta)), 'removed': int(len(removed)),
+        }
+        if delta.empty and removed.empty:
+            return summary
+
+        stale = pd.concat([delta[self.KEY], removed], ignore_index=True)
+        cleaned = [DataCleaner.from_merged(delta.copy()).clean_rows()] if len(delta) else []
+        if rows is not None:
+            replaced = rows[self.KEY].isin(stale)
+            stats = self.update_stats(stats, rows[replaced], -1)
+            rows = pd.concat([rows[~replaced]] + cleaned, ignore_index=True)
+        else:
+            rows = cleaned[0].reset_index(drop=True)
+        for new_rows in cleaned:
+            stats = self.update_stats(stats, new_rows, 1)
+
+        seen = pd.concat([
+            seen[~seen[self.KEY].isin(stale)],
+            delta[[self.KEY, self.FINGERPRINT]],
+        ], ignore_index=True)
+        self.save(rows, seen, stats)
+        return summary
+
+    def materialize(self):
+        """
+        Applies the whole table fills of fill_review_score_reviews_total to the stored rows,
+        taking the median and mean from the sufficient statistics.
+
+        Returns:
+            The cleaned dataframe.
+        """
+        rows, _, stats = self.load()
+        if rows is None:
+            return None
+
+        df = rows[(rows['Reviews Total'] != 0) & (rows['review_score'] != 0)]
+        df = df.drop([self.KEY, self.FINGERPRINT], axis=1)
+
+        mean = stats['score_sum'] / stats['score_count'] if stats['score_count'] else float('nan')
+        df["Reviews Total"] = df["Reviews Total"].fillna(self.median(stats['reviews_total_counts']))
+        df["review_score"] = df["review_score"].fillna(mean)
+        return df
@@ -0,0 +1,77 @@
+import pandas as pd
+
+class MemoryOptimizer:
+    """
+    A class to convert the cleaned dataframe to a compact in-memory representation.
+
+    Attributes:
+        df: The cleaned dataframe.
+    """
+    CATEGORICAL_COLUMNS = ['review_summary']
+    STRING_COLUMNS = ['name', 'Tags']
+    NUMERIC_COLUMNS = ['Reviews Total', 'review_score', 'launch_price']
+
+    def __init__(self, df):
+        """
+        Initializes the MemoryOptimizer instance with a dataframe.
+
+        Args:
+            df: The cleaned dataframe.
+        """
+        self.df = df
+
+    def downcast(self, column):
+        """
+        Downcasts a numeric column to the smallest integer type holding it exactly, or to float32
+        when it has fractions or missing values.
+
+        Args:
+            column: The numeric series.
+
+        Returns:
+            The downcast series.
+        """
+        downcast = pd.to_numeric(column, downcast='integer')
+        if pd.api.types.is_float_dtype(downcast):
+            downcast = pd.to_numeric(column, downcast='float')
+        return downcast
+
+    def compact(self):
+        """
+        Converts review_summary to a categorical, the text columns to Arrow backed strings and
+        the numeric review and price columns to smaller types. The original dataframe is not modified.
+
+        Returns:
+            The compact dataframe.
+        """
+        compact_df = self.df.copy(deep=False)
+        for col in self.CATEGORICAL_COLUMNS:
+            compact_df[col] = compact_df[col].astype('category')
+        for col in self.STRING_COLUMNS:
+            compact_df[col] = compact_df[col].astype('string[pyarrow]')
+        for col in self.NUMERIC_COLUMNS:
+            compact_df[col] = self.downcast(compact_df[col])
+        return compact_df
+
+    def memory_report(self, compact_df=None):
+        """
+        Compares the memory used by every column before and after the conversion.
+
+        Args:
+            compact_df: The compact dataframe, converted from df when not given.
+
+        Returns:
+            A dataframe with the dtype and bytes of every column before and after, plus a total row.
+        """
+        if compact_df is None:
+            compact_df = self.compact()
+
+        report = pd.DataFrame({
+            'dtype_before': self.df.dtypes.astype(str),
+            'bytes_before': self.df.memory_usage(deep=True, index=False),
+            'dtype_after': compact_df.dtypes.astype(str),
+            'bytes_after': compact_df.memory_usage(deep=True, index=False),
+        })
+        report.loc['Total'] = ['', report['bytes_before'].sum(), '', report['bytes_after'].sum()]
+        report['ratio'] = report['bytes_after'] / report['bytes_before']
+        return report
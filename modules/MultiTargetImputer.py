@@ -0,0 +1,207 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import os
+import time
+import xgboost
+import numpy as np
+import pandas as pd
+
+class DeadlineCallback(xgboost.callback.TrainingCallback):
+    """
+    Stops boosting once the latency budget of the imputation run is spent.
+    """
+
+    def __init__(self, deadline):
+        self.deadline = deadline
+        self.expired = False
+
+    def after_iteration(self, model, epoch, evals_log):
+        self.expired = time.perf_counter() > self.deadline
+        return self.expired
+
+
+class MultiTargetImputer:
+    """
+    A class to impute several columns of the row wise cleaned dataframe (DataCleaner.clean_rows)
+    with one XGBoost model per column.
+
+    The feature matrix is built once and shared by every target, each model reading all
+    feature columns except its own target. Numeric targets get a regression model, the others
+    a classifier. The models train concurrently on a thread pool, XGBoost releasing the GIL
+    while boosting. Targets whose model does not finish within the latency budget fall back to
+    the median (numeric) or the most frequent value (others) of their observed rows.
+
+    Attributes:
+        df: The dataframe containing the data for imputation.
+        targets: The columns to impute.
+        budget_seconds: Latency budget of the whole run, None for no limit.
+        n_workers: Number of models trained at once.
+        report: Per target summary of the last run.
+        elapsed: Wall time of the last run in seconds.
+    """
+    NUMERIC_FEATURES = ['Reviews Total', 'review_score', 'launch_price', 'Revenue Estimated']
+    CATEGORICAL_FEATURES = ['review_summary']
+    TARGETS = ['review_summary', 'Revenue Estimated', 'Reviews Total', 'review_score']
+    NUM_BOOST_ROUND = 200
+    PARAMS = {'tree_method': 'hist', 'max_depth': 6, 'learning_rate': 0.1, 'seed': 42}
+
+    def __init__(self, df, targets=None, budget_seconds=None, n_workers=None):
+        """
+        Initializes the MultiTargetImputer instance with a dataframe and its targets.
+
+        Args:
+            df: The dataframe containing the data for imputation.
+            targets: The columns to impute, TARGETS when not given.
+            budget_seconds: Latency budget of the whole run, None for no limit.
+            n_workers: Number of models trained at once, one per target when not given.
+        """
+        self.df = df
+        self.targets = targets if targets is not None else self.TARGETS
+        self.budget_seconds = budget_seconds
+        self.n_workers = n_workers or len(self.targets)
+        self.report = None
+        self.elapsed = None
+        return None
+
+    def missing(self, column):
+        """
+        Returns the mask of the missing values of a column, '' counting as missing for text.
+        """
+        missing = column.isna()
+        if not pd.api.types.is_numeric_dtype(column):
+            missing |= column.astype(object) == ''
+        return missing.to_numpy()
+
+    def build_features(self):
+        """
+        Builds the shared feature matrix: the numeric columns, the release year and the codes
+        of the categorical columns, with NaN for missing values.
+
+        Returns:
+            A tuple of the contiguous float32 feature matrix and its column names.
+        """
+        columns, names = [], []
+        for col in self.NUMERIC_FEATURES:
+            if col in self.df.columns:
+                columns.append(self.df[col].to_numpy(dtype=np.float32, na_value=np.nan))
+                names.append(col)
+
+        if 'Release Date' in self.df.columns:
+            year = pd.to_datetime(self.df['Release Date'], errors='coerce').dt.year
+            columns.append(year.to_numpy(dtype=np.float32, na_value=np.nan))
+            names.append('Release Year')
+
+        for col in self.CATEGORICAL_FEATURES:
+            if col in self.df.columns:
+                codes = pd.factorize(self.df[col].astype(object))[0].astype(np.float32)
+                codes[self.missing(self.df[col])] = np.nan
+                columns.append(codes)
+                names.append(col)
+
+        return np.ascontiguousarray(np.column_stack(columns)), names
+
+    def fallback(self, column, observed):
+        """
+        Returns the quick fill value of a column: the median of its observed values when it is
+        numeric, the most frequent one otherwise.
+        """
+        values = column[observed]
+        if pd.api.types.is_numeric_dtype(column):
+            return values.median()
+        return values.astype(object).mode().iloc[0]
+
+    def fit_predict(self, target, features, names, deadline, nthread):
+        """
+        Trains the model of one target on its observed rows and predicts its missing rows.
+
+        Args:
+            target: The column to impute.
+            features: The shared feature matrix.
+            names: The feature column names.
+            deadline: perf_counter value at which the budget is spent, None for no limit.
+            nthread: Number of XGBoost threads of the model.
+
+        Returns:
+            A tuple of the predicted values (None when the model ran out of time) and the task.
+        """
+        column = self.df[target]
+        missing = self.missing(column)
+        keep = [i for i, name in enumerate(names) if name != target]
+        X_observed = features[~missing][:, keep]
+        X_missing = features[missing][:, keep]
+        feature_names = [names[i] for i in keep]
+
+        params = dict(self.PARAMS, nthread=nthread)
+        if pd.api.types.is_numeric_dtype(column):
+            task = 'regression'
+            labels = None
+            y = column.to_numpy(dtype=np.float32)[~missing]
+            params['objective'] = 'reg:squarederror'
+        else:
+            task = 'classification'
+            codes, labels = pd.factorize(column.astype(object)[~missing])
+            y = codes.astype(np.float32)
+            params.update(objective='multi:softmax', num_class=len(labels))
+
+        if deadline is not None and time.perf_counter() > deadline:
+            return None, task
+
+        callback = DeadlineCallback(deadline if deadline is not None else float('inf'))
+        model = xgboost.train(
+            params,
+            xgboost.DMatrix(X_observed, label=y, feature_names=feature_names, nthread=nthread),
+            num_boost_round=self.NUM_BOOST_ROUND,
+            callbacks=[callback],
+        )
+        if callback.expired:
+            return None, task
+
+        predictions = model.predict(xgboost.DMatrix(X_missing, feature_names=feature_names, nthread=nthread))
+        if labels is not None:
+            predictions = np.asarray(labels, dtype=object)[predictions.astype(np.intp)]
+        return predictions, task
+
+    def impute(self):
+        """
+        Imputes every target column, with a model or, past the latency budget, the fallback.
+
+        Returns:
+            The updated dataframe.
+        """
+        start = time.perf_counter()
+        deadline = start + self.budget_seconds if self.budget_seconds is not None else None
+        features, names = self.build_features()
+        nthread = max(1, os.cpu_count() // min(self.n_workers, len(self.targets)))
+
+        # only targets with both observed and missing rows need a model
+        targets = [t for t in self.targets if 0 < self.missing(self.df[t]).sum() < len(self.df)]
+        with ThreadPoolExecutor(self.n_workers) as pool:
+            futures = {
+                target: pool.submit(self.fit_predict, target, features, names, deadline, nthread)
+                for target in targets
+            }
+            results = {target: future.result() for target, future in futures.items()}
+
+        report = []
+        for target, (predictions, task) in results.items():
+            column = self.df[target]
+            missing = self.missing(column)
+            method = 'model'
+            if predictions is None:
+                method = 'fallback'
+                predictions = self.fallback(column, ~missing)
+
+            filled = pd.Series(np.nan, index=column.index, dtype=object)
+            filled[missing] = predictions
+            column = column.mask(missing, filled)
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                column = column.cat.remove_unused_categories()
+            elif task == 'regression':
+                column = column.astype(float)
+            self.df[target] = column
+
+            report.append({'target': target, 'task': task, 'method': method, 'imputed': int(missing.sum())})
+
+        self.report = pd.DataFrame(report, columns=['target', 'task', 'method', 'imputed']).set_index('target')
+        self.elapsed = time.perf_counter() - start
+        return self.df
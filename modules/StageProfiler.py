@@ -0,0 +1,83 @@
+import json
+import time
+import tracemalloc
+import pandas as pd
+
+class StageProfiler:
+    """
+    A class to measure every stage of the cleaning pipeline.
+
+    For each named stage it records wall time, CPU time, the peak memory allocated while the stage
+    ran (tracemalloc), rows in and out, and the columns the stage added or dropped.
+
+    Attributes:
+        callback: Optional callable receiving the record of every stage as soon as it finishes.
+        stages: The records of the stages measured so far.
+    """
+
+    def __init__(self, callback=None):
+        """
+        Initializes the StageProfiler instance.
+
+        Args:
+            callback: Optional callable receiving the record (a dictionary) of every stage.
+        """
+        self.callback = callback
+        self.stages = []
+
+    def run(self, name, action, df):
+        """
+        Runs one stage and records its measurements.
+
+        Args:
+            name: Name of the stage.
+            action: Callable running the stage and returning the updated dataframe.
+            df: The dataframe before the stage.
+
+        Returns:
+            The dataframe returned by the stage.
+        """
+        rows_in = len(df)
+        columns_in = list(df.columns)
+
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        memory_before = tracemalloc.get_traced_memory()[0]
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+
+        result = action()
+
+        wall_time = time.perf_counter() - wall_start
+        cpu_time = time.process_time() - cpu_start
+        peak_memory = tracemalloc.get_traced_memory()[1] - memory_before
+        if started:
+            tracemalloc.stop()
+
+        record = {
+            'stage': name,
+            'wall_time_s': wall_time,
+            'cpu_time_s': cpu_time,
+            'peak_memory_mb': peak_memory / 2 ** 20,
+            'rows_in': rows_in,
+            'rows_out': len(result),
+            'columns_added': [col for col in result.columns if col not in columns_in],
+            'columns_dropped': [col for col in columns_in if col not in result.columns],
+        }
+        self.stages.append(record)
+        if self.callback is not None:
+            self.callback(record)
+        return result
+
+    def to_json(self, indent=2):
+        """
+        Returns the stage records as a JSON string.
+        """
+        return json.dumps(self.stages, indent=indent, default=str)
+
+    def to_frame(self):
+        """
+        Returns the stage records as a dataframe indexed by stage name.
+        """
+        return pd.DataFrame(self.stages).set_index('stage')
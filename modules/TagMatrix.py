@@ -0,0 +1,181 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+class TagMatrix:
+    """
+    A sparse game x tag incidence matrix built from the comma joined 'Tags' column.
+
+    Attributes:
+        matrix: CSR matrix with one row per game and one column per tag, holding how often
+            the tag occurs in the game's tags.
+        vocabulary: The interned tags, in column order.
+        index: The dataframe index the rows belong to.
+    """
+
+    def __init__(self, matrix, vocabulary, index):
+        """
+        Initializes the TagMatrix instance.
+
+        Args:
+            matrix: The CSR incidence matrix.
+            vocabulary: A pandas Index of tags matching the matrix columns.
+            index: The dataframe index matching the matrix rows.
+        """
+        self.matrix = matrix
+        self.vocabulary = vocabulary
+        self.index = index
+
+    @classmethod
+    def from_tags(cls, tags):
+        """
+        Splits the tags of every game once and interns them into a vocabulary.
+
+        Args:
+            tags: Series of comma joined tags.
+
+        Returns:
+            A TagMatrix with the stripped tags as vocabulary.
+        """
+        exploded = tags.reset_index(drop=True).str.split(',').explode()
+        codes, vocabulary = pd.factorize(exploded.str.strip())
+
+        # games without a tag string (NaN) have no entry
+        present = codes >= 0
+        rows = exploded.index.to_numpy()[present]
+        matrix = sparse.csr_matrix(
+            (np.ones(present.sum()), (rows, codes[present])),
+            shape=(len(tags), len(vocabulary))
+        )
+        return cls(matrix, pd.Index(vocabulary), tags.index)
+
+    @staticmethod
+    def normalize_tag(tag):
+        """
+        Normalizes the spelling of a tag so that variants such as 'Co-op' and 'co op' match.
+        """
+        tag = tag.strip().lower()
+        tag = tag.replace('co-op', 'co op')
+        tag = tag.replace('first-person', 'first person')
+        return tag
+
+    def normalized(self):
+        """
+        Merges the columns of tags which normalize to the same spelling. Normalization runs
+        once per distinct tag instead of once per game and tag.
+
+        Returns:
+            A new TagMatrix over the normalized vocabulary.
+        """
+        codes, vocabulary = pd.factorize(self.vocabulary.map(self.normalize_tag))
+        projection = sparse.csr_matrix(
+            (np.ones(len(codes)), (np.arange(len(codes)), codes)),
+            shape=(len(self.vocabulary), len(vocabulary))
+        )
+        return TagMatrix((self.matrix @ projection).tocsr(), pd.Index(vocabulary), self.index)
+
+    def align(self, index):
+        """
+        Selects the rows of the games still present in a (filtered) dataframe.
+
+        Args:
+            index: The index of the dataframe to align to.
+
+        Returns:
+            A new TagMatrix whose rows follow the given index.
+        """
+        positions = self.index.get_indexer(index)
+        if (positions < 0).any():
+            raise KeyError('The dataframe contains rows which are not in the tag matrix.')
+        return TagMatrix(self.matrix[positions], self.vocabulary, index)
+
+    def select(self, tags):
+        """
+        Restricts the matrix to the given tags, skipping the ones not in the vocabulary.
+
+        Args:
+            tags: List of tags to keep.
+
+        Returns:
+            A new TagMatrix over the selected tags, in the given order.
+        """
+        positions = self.vocabulary.get_indexer(tags)
+        positions = positions[positions >= 0]
+        return TagMatrix(self.matrix[:, positions], self.vocabulary[positions], self.index)
+
+    def distinct_rows(self):
+        """
+        Numbers the distinct rows of the matrix, the distinct tag combinations of the games, one
+        tag position at a time so that the rows are never materialized.
+
+        Returns:
+            A tuple of the code of every row and the position of the first row of every code.
+        """
+        matrix = self.matrix.copy()
+        matrix.sum_duplicates()
+        matrix.eliminate_zeros()
+        lengths = np.diff(matrix.indptr)
+        # every (tag, count) pair as one integer key
+        count_codes, counts = pd.factorize(matrix.data)
+        keys = matrix.indices.astype(np.int64) * len(counts) + count_codes + 1
+
+        codes = np.zeros(matrix.shape[0], dtype=np.int64)
+        for position in range(lengths.max() if len(lengths) else 0):
+            entry = np.zeros(matrix.shape[0], dtype=np.int64)
+            longer = lengths > position
+            entry[longer] = keys[matrix.indptr[:-1][longer] + position]
+            codes = pd.factorize(codes * (len(self.vocabulary) * len(counts) + 1) + entry)[0]
+        first = np.unique(codes, return_index=True)[1]
+        return codes, first
+
+    def tag_sums(self, values, rows=None):
+        """
+        Sums a per game value over the games of every tag, skipping NaN like a groupby sum.
+
+        Args:
+            values: Array of per game values.
+            rows: Optional boolean mask of the games to include.
+
+        Returns:
+            A Series of sums indexed by tag.
+        """
+        values = np.asarray(values, dtype=float)
+        keep = ~np.isnan(values) if rows is None else ~np.isnan(values) & rows
+        return pd.Series(self.matrix.T @ np.where(keep, values, 0.0), index=self.vocabulary)
+
+    def grouped_tag_sums(self, values, groups, n_groups):
+        """
+        Sums a per game value over the games of every (group, tag) pair in one sparse product,
+        skipping NaN like a groupby sum.
+
+        Args:
+            values: Array of per game values, or of shape (games, k) to sum k values at once.
+            groups: Array of per game group codes, -1 for games outside every group.
+            n_groups: Number of groups.
+
+        Returns:
+            A dense array of shape (n_groups, number of tags), or (n_groups, number of tags, k).
+        """
+        values = np.asarray(values, dtype=float)
+        groups = np.asarray(groups)
+        columns = values[:, None] if values.ndim == 1 else values
+        keep = (groups >= 0)[:, None] & ~np.isnan(columns)
+        rows, column = np.nonzero(keep)
+        membership = sparse.csr_matrix(
+            (columns[keep], (rows, groups[rows] * columns.shape[1] + column)),
+            shape=(self.matrix.shape[0], n_groups * columns.shape[1])
+        )
+        sums = (membership.T @ self.matrix).toarray().reshape(n_groups, columns.shape[1], -1)
+        return sums[:, 0] if values.ndim == 1 else sums.transpose(0, 2, 1)
+
+    def tag_counts(self, rows=None):
+        """
+        Counts the occurrences of every tag.
+
+        Args:
+            rows: Optional boolean mask of the games to include.
+
+        Returns:
+            A Series of counts indexed by tag.
+        """
+        return self.tag_sums(np.ones(self.matrix.shape[0]), rows)